@@ -0,0 +1,181 @@
+from datetime import date
+from business_days import default_calendar
+from calculators import calculate_duration_details, get_iso_year, get_week_of_year
+from event_model import parse_date_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Ordinal of 1970-01-01, day 0 of datetime64[D]
+_EPOCH = date(1970, 1, 1).toordinal()
+_MIN_DAY = date.min.toordinal() - _EPOCH
+_MAX_DAY = date.max.toordinal() - _EPOCH
+
+
+# The calculators over whole columns of dates, for planning spreadsheets.
+# Columns are sequences of date or datetime objects or 'YYYY-MM-DD'
+# strings, or datetime64 arrays. With NumPy a column is computed in a few
+# array operations and the results are arrays, dates as datetime64[D];
+# without it the scalar calculators run row by row and the results are
+# lists, dates as date objects.
+
+def as_days(dates):
+    """A column as the other functions take it: a datetime64[D] array, or
+    without NumPy a list of dates. Converting a column once saves every
+    function doing it again."""
+    if np is not None:
+        dates = np.asarray(dates)
+        if dates.dtype == object:
+            # Through ordinals, many times faster than NumPy converting
+            # date objects itself
+            try:
+                days = np.fromiter((d.toordinal() for d in dates.flat), dtype="int64",
+                                   count=dates.size)
+                return (days - _EPOCH).astype("datetime64[D]").reshape(dates.shape)
+            except AttributeError:
+                pass
+        return dates.astype("datetime64[D]")
+    days = []
+    for d in dates:
+        if isinstance(d, str):
+            day = parse_date_key(d)
+            if day is None:
+                raise ValueError(f"Not a YYYY-MM-DD date: {d!r}")
+            d = date.fromordinal(day)
+        days.append(d)
+    return days
+
+
+def _as_list(values, n):
+    """values as a list of n, repeating a single value"""
+    if isinstance(values, int):
+        return [values] * n
+    values = list(values)
+    if len(values) != n:
+        raise ValueError(f"Expected {n} values, got {len(values)}")
+    return values
+
+
+def _weekday(days):
+    # 1970-01-01 was a Thursday
+    return (days.astype("int64") + 3) % 7
+
+
+def weekdays(dates):
+    """Weekday of each date, Monday = 0"""
+    days = as_days(dates)
+    if np is None:
+        return [d.weekday() for d in days]
+    return _weekday(days)
+
+
+def iso_weeks(dates):
+    """(ISO years, ISO week numbers) of the dates"""
+    days = as_days(dates)
+    if np is None:
+        return [get_iso_year(d) for d in days], [get_week_of_year(d) for d in days]
+    # A week belongs to the year its Thursday is in
+    thursdays = days + (3 - _weekday(days))
+    years = thursdays.astype("datetime64[Y]")
+    weeks = (thursdays - years.astype("datetime64[D]")).astype("int64") // 7 + 1
+    return years.astype("int64") + 1970, weeks
+
+
+def _check_day(day):
+    if not date.min.toordinal() <= day <= date.max.toordinal():
+        raise OverflowError("date value out of range")
+    return day
+
+
+def add_days(dates, offsets):
+    """Each date plus its number of days, or minus when it is negative;
+    offsets may be one number for every date"""
+    days = as_days(dates)
+    if np is None:
+        return [date.fromordinal(_check_day(d.toordinal() + n))
+                for d, n in zip(days, _as_list(offsets, len(days)))]
+    result = days + np.asarray(offsets, dtype="int64")
+    values = result.astype("int64")
+    if values.size and (values.min() < _MIN_DAY or values.max() > _MAX_DAY):
+        raise OverflowError("date value out of range")
+    return result
+
+
+def _split(days):
+    """Year, month and day of month columns of a datetime64[D] array"""
+    months = days.astype("datetime64[M]")
+    years = days.astype("datetime64[Y]")
+    return (years.astype("int64") + 1970,
+            (months - years.astype("datetime64[M]")).astype("int64") + 1,
+            (days - months.astype("datetime64[D]")).astype("int64") + 1)
+
+
+def durations(dates1, dates2):
+    """calculate_duration_details() of each pair of dates, as a dict of
+    columns with the same keys"""
+    days1, days2 = as_days(dates1), as_days(dates2)
+    if np is None:
+        if len(days1) != len(days2):
+            raise ValueError(f"Expected {len(days1)} values, got {len(days2)}")
+        rows = [calculate_duration_details(d1, d2) for d1, d2 in zip(days1, days2)]
+        keys = ('total_days', 'years', 'months', 'days', 'weeks', 'remaining_days',
+                'weekdays', 'weekends')
+        return {key: [row[key] for row in rows] for key in keys}
+    lo, hi = np.minimum(days1, days2), np.maximum(days1, days2)
+    total = (hi - lo).astype("int64")
+    lo_year, lo_month, lo_day = _split(lo)
+    hi_year, hi_month, hi_day = _split(hi)
+    years = hi_year - lo_year
+    months = hi_month - lo_month
+    days = hi_day - lo_day
+    # Borrow a year for a negative month and the previous month's length
+    # for a negative day, as calculate_duration_details does
+    short = days < 0
+    months -= short
+    wrap = months < 0
+    years -= wrap
+    months += 12 * wrap
+    month_start = hi.astype("datetime64[M]")
+    prev_length = (month_start.astype("datetime64[D]")
+                   - (month_start - 1).astype("datetime64[D]")).astype("int64")
+    days = np.where(short, days + prev_length, days)
+    # Weekdays as count_weekdays() counts them, from lo to hi included
+    full_weeks, rest = np.divmod(total + 1, 7)
+    first = _weekday(lo)
+    weekday_count = (full_weeks * 5 + np.clip(np.minimum(first + rest, 5) - first, 0, None)
+                     + np.clip(first + rest - 7, 0, None))
+    return {
+        'total_days': total,
+        'years': years,
+        'months': months,
+        'days': days,
+        'weeks': total // 7,
+        'remaining_days': total % 7,
+        'weekdays': weekday_count,
+        'weekends': total + 1 - weekday_count
+    }
+
+
+def business_day_counts(dates1, dates2, calendar=None):
+    """Business days from each date to the other, both included, in
+    either order; ``calendar`` is a BusinessCalendar, by default the one
+    of business_days' settings"""
+    calendar = calendar or default_calendar()
+    days1, days2 = as_days(dates1), as_days(dates2)
+    if np is None:
+        if len(days1) != len(days2):
+            raise ValueError(f"Expected {len(days1)} values, got {len(days2)}")
+        return [calendar.count(d1, d2) for d1, d2 in zip(days1, days2)]
+    lo, hi = np.minimum(days1, days2), np.maximum(days1, days2)
+    if not lo.size:
+        return np.zeros(lo.shape, dtype="int64")
+    first_year = int(lo.min().astype("datetime64[Y]").astype("int64")) + 1970
+    last_year = int(hi.max().astype("datetime64[Y]").astype("int64")) + 1970
+    holidays = [day - _EPOCH for year in range(first_year, last_year + 1)
+                for day in calendar.holidays(year)]
+    busdays = np.busdaycalendar(
+        weekmask=[wd not in calendar.weekend for wd in range(7)],
+        holidays=np.array(holidays, dtype="int64").astype("datetime64[D]"))
+    return np.busday_count(lo, hi + 1, busdaycal=busdays)
@@ -0,0 +1,623 @@
+"""Performance measurements for CalendarApp.
+
+Run ``python benchmarks.py`` for all of them or ``python benchmarks.py NAME``
+for one. They use synthetic events and temporary files, never
+calendar_events.json.
+"""
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import batch_dates
+from business_days import BusinessCalendar
+from calculators import calculate_duration_details, get_iso_year, get_week_of_year
+from event_store import EventStore
+from ical import iter_export, iter_import
+from recurrence import FREQUENCIES, RecurringEvents, Rule
+from storage import (BinaryBackend, JsonBackend, RuleFile, ShardedBackend, SqliteBackend,
+                     events_from_json, events_to_json, renumber_duplicate_ids)
+
+
+def synthetic_events(count, seed=1):
+    """Return {date: [event dict, ...]} with ``count`` events over ten years"""
+    rng = random.Random(seed)
+    words = ["meeting", "dentist", "birthday", "party", "lunch", "call",
+             "project", "review", "deadline", "gym", "trip", "dinner"]
+    first = date(2016, 1, 1).toordinal()
+    events = {}
+    for i in range(count):
+        day = date.fromordinal(first + rng.randrange(3650))
+        date_str = f"{day.year}-{day.month:02d}-{day.day:02d}"
+        event_list = events.setdefault(date_str, [])
+        event_list.append({
+            "id": len(event_list) + 1,
+            "text": " ".join(rng.sample(words, 3)) + f" #{i}",
+            "created_at": f"{date_str} {rng.randrange(24):02d}:{rng.randrange(60):02d}"
+        })
+    return events
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _allocated(build):
+    """Return (result, bytes still allocated by build())"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+# ==================== BENCHMARKS ====================
+
+def bench_event_memory(count=100_000):
+    """Per-event memory of the event lists, dict rows vs Event objects"""
+    data = synthetic_events(count)
+
+    def dict_rows():
+        # What get_all_events used to build for every event
+        rows = []
+        for date_str, event_list in data.items():
+            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+            for event in event_list:
+                created_time = datetime.strptime(event['created_at'], "%Y-%m-%d %H:%M")
+                rows.append({
+                    'date': date_str,
+                    'date_obj': date_obj,
+                    'text': event.get('text', ''),
+                    'created': created_time.strftime("%Y-%m-%d %H:%M"),
+                    'created_obj': created_time
+                })
+        return rows
+
+    def event_objects():
+        return [event for event_list in events_from_json(data).values() for event in event_list]
+
+    print(f"Event memory, {count} events (text strings included in both):")
+    for name, build in (("dict rows", dict_rows), ("Event objects", event_objects)):
+        rows, size = _allocated(build)
+        _, seconds = _timed(build)
+        print(f"  {name:14} {size / count:7.1f} bytes/event  build {seconds * 1000:7.1f} ms")
+        del rows
+
+
+def bench_ics(count=100_000, batch_size=1000):
+    """Streaming .ics export and import: throughput and working memory"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = EventStore(JsonBackend(os.path.join(tmp, "source.json")))
+        source.replace(events_from_json(synthetic_events(count)))
+        # Build the sorted view outside the timings
+        next(source.iter_events(), None)
+        ics_path = os.path.join(tmp, "events.ics")
+        runs = [0]
+
+        def export():
+            with open(ics_path, "w", encoding="utf-8", newline="") as f:
+                return list(iter_export(source.iter_events(reverse=False), f, batch_size))[-1]
+
+        def do_import():
+            runs[0] += 1
+            target = EventStore(JsonBackend(os.path.join(tmp, f"target{runs[0]}.json"),
+                                            journal=True))
+            with open(ics_path, encoding="utf-8", newline="") as f:
+                return list(iter_import(f, target.add_many, batch_size))[-1]
+
+        print(f".ics streaming, {count} events, batches of {batch_size}:")
+        for name, run in (("export", export), ("import", do_import)):
+            done, seconds = _timed(run)
+            # Memory still held afterwards (the imported events) is not
+            # working memory, so report how far the peak went above it
+            tracemalloc.start()
+            run()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  {name:7} {done / seconds:10,.0f} events/s  {seconds:6.2f} s"
+                  f"  working memory {(peak - current) / 2 ** 20:6.1f} MiB")
+        print(f"  file size {os.path.getsize(ics_path) / 2 ** 20:.1f} MiB")
+
+
+def bench_lazy_load(count=400_000):
+    """One date from a large events file: full parse vs memory-mapped index"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.json")
+        events = events_from_json(synthetic_events(count))
+        # Give the events global IDs so loading does not rewrite the file
+        renumber_duplicate_ids(events)
+        JsonBackend(path, lazy=True).save(events)
+        date_str = next(iter(events))
+        legacy_path = os.path.join(tmp, "legacy.json")
+        with open(legacy_path, "w", encoding="utf-8") as f:
+            json.dump(events_to_json(events), f, indent=4, ensure_ascii=False)
+        del events
+        print(f"Loading one date, {count} events, "
+              f"{os.path.getsize(path) / 2 ** 20:.1f} MiB file:")
+        _, seconds = _timed(lambda: JsonBackend(path).load().get(date_str, []))
+        print(f"  full json.loads      {seconds * 1000:9.1f} ms")
+        _, seconds = _timed(JsonBackend(path, lazy=True).load_date, date_str)
+        print(f"  mmap + sidecar index {seconds * 1000:9.1f} ms")
+        os.remove(path + ".index")
+        _, seconds = _timed(JsonBackend(path, lazy=True).load_date, date_str)
+        print(f"  mmap, index rebuilt  {seconds * 1000:9.1f} ms")
+        # Without a next ID or an index: parsed once, then rewritten
+        _, seconds = _timed(JsonBackend(legacy_path, lazy=True).load_date, date_str)
+        print(f"  old file, first open {seconds * 1000:9.1f} ms")
+
+
+def bench_snapshot(counts=(10_000, 100_000, 1_000_000)):
+    """Save and load times of the JSON and binary snapshot formats"""
+    print("Snapshot save / load (ms), file size:")
+    for count in counts:
+        events = events_from_json(synthetic_events(count))
+        renumber_duplicate_ids(events)
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, backend in (("json", JsonBackend(os.path.join(tmp, "events.json"))),
+                                  ("binary", BinaryBackend(os.path.join(tmp, "events.bin")))):
+                _, save_seconds = _timed(backend.save, events)
+                _, load_seconds = _timed(backend.load)
+                print(f"  {count:9,} {name:6}  save {save_seconds * 1000:9.1f}"
+                      f"  load {load_seconds * 1000:9.1f}"
+                      f"  {os.path.getsize(backend.path) / 2 ** 20:7.1f} MiB")
+        del events
+
+
+def bench_sharded(count=100_000):
+    """One-event change and one-month read: single file vs monthly shards"""
+    events = events_from_json(synthetic_events(count))
+    renumber_duplicate_ids(events)
+    print(f"Single events file vs monthly shards, {count} events (ms):")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, backend in (("single file", JsonBackend(os.path.join(tmp, "events.json"))),
+                              ("shards", ShardedBackend(os.path.join(tmp, "shards")))):
+            backend.save(events)
+            store = EventStore(backend)
+            _, read_seconds = _timed(store.events_in_range, "2020-03-01", "2020-03-31")
+            _, add_seconds = _timed(store.add, "2020-03-15", "benchmark event")
+            print(f"  {name:12} read a month {read_seconds * 1000:8.1f}"
+                  f"  add one event {add_seconds * 1000:8.1f}")
+
+
+def _open_backend(kind, tmp):
+    if kind == "json":
+        return JsonBackend(os.path.join(tmp, "events.json"), journal=True, lazy=True)
+    if kind == "shards":
+        return ShardedBackend(os.path.join(tmp, "shards"))
+    return SqliteBackend(os.path.join(tmp, "events.db"))
+
+
+def _concurrent_writer(kind, tmp, worker, count):
+    """Add count events, fixing up the text of every tenth one afterwards"""
+    store = EventStore(_open_backend(kind, tmp))
+    rng = random.Random(worker)
+    for i in range(count):
+        date_str = f"2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+        if i % 10 == 0:
+            event_id = store.add(date_str, f"p{worker}-{i} draft")
+            store.update_by_id(event_id, text=f"p{worker}-{i}")
+        else:
+            store.add(date_str, f"p{worker}-{i}")
+
+
+def bench_concurrency(workers=(1, 2, 4, 8), count=200):
+    """Several processes adding to the same events at once: throughput as
+    their number grows. Fails if a write was lost or given a duplicate ID."""
+    print(f"Concurrent writers, {count} events each (events/s, and vs one process):")
+    for kind in ("json", "shards", "sqlite"):
+        single = None
+        for n in workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                _open_backend(kind, tmp).save({})
+                processes = [multiprocessing.Process(target=_concurrent_writer,
+                                                     args=(kind, tmp, worker, count))
+                             for worker in range(n)]
+                start = time.perf_counter()
+                for process in processes:
+                    process.start()
+                for process in processes:
+                    process.join()
+                seconds = time.perf_counter() - start
+                events = _open_backend(kind, tmp).load()
+                texts = sorted(event.text for event_list in events.values()
+                               for event in event_list)
+                ids = {event.id for event_list in events.values() for event in event_list}
+                expected = sorted(f"p{worker}-{i}" for worker in range(n) for i in range(count))
+                if texts != expected or len(ids) != len(texts):
+                    raise AssertionError(f"{kind} with {n} processes: {len(texts)} events with "
+                                         f"{len(ids)} IDs stored, {len(expected)} expected")
+                rate = n * count / seconds
+                single = single or rate
+                print(f"  {kind:6} {n} process(es) {rate:8.0f}  {rate / single:5.2f}x")
+
+
+def bench_day_counts(count=100_000):
+    """Event counts for a month grid: one lookup per cell vs the aggregate"""
+    events = events_from_json(synthetic_events(count))
+    renumber_duplicate_ids(events)
+    print(f"Counting a month's events, {count} events (ms):")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.json")
+        JsonBackend(path).save(events)
+        # Build the lazy loading index outside the timings
+        JsonBackend(path, lazy=True).load_date("2020-01-01")
+        store = EventStore(JsonBackend(path, lazy=True))
+        _, seconds = _timed(lambda: {day: len(store.events_for_date(f"2020-03-{day:02d}"))
+                                     for day in range(1, 32)})
+        print(f"  one date per cell       {seconds * 1000:8.1f}")
+        store = EventStore(JsonBackend(path, lazy=True))
+        _, seconds = _timed(store.day_counts, 2020, 3)
+        print(f"  aggregate, first use    {seconds * 1000:8.1f}")
+        store.add("2020-03-15", "benchmark event")
+        _, seconds = _timed(store.day_counts, 2020, 3)
+        print(f"  aggregate, after an add {seconds * 1000:8.1f}")
+
+
+def synthetic_rules(count, seed=1):
+    """Return ``count`` rule dicts of every kind, starting over ten years"""
+    rng = random.Random(seed)
+    first = date(2016, 1, 1).toordinal()
+    rules = []
+    for i in range(count):
+        start = first + rng.randrange(3650)
+        rules.append(Rule(i + 1, f"rule #{i}", start, rng.choice(FREQUENCIES),
+                          rng.choice((1, 1, 2, 3)),
+                          rng.choice((None, None, (0, 2, 4), (5, 6))),
+                          rng.choice((None, start + rng.randrange(3650))),
+                          rng.choice((None, None, None, 20)),
+                          [start + 7 * rng.randrange(50)]).to_dict())
+    return rules
+
+
+def bench_recurrence(count=10_000):
+    """Showing one month with many recurring event rules"""
+    print(f"Recurring events, {count} rules (ms):")
+    with tempfile.TemporaryDirectory() as tmp:
+        rule_file = RuleFile(os.path.join(tmp, "rules.json"))
+        rule_file.save(synthetic_rules(count), count + 1)
+        recurring = RecurringEvents(rule_file)
+        _, seconds = _timed(recurring.refresh)
+        print(f"  load rules              {seconds * 1000:8.1f}")
+        months = [(date(2024, month, 1).toordinal(),
+                   date(2024 + month // 12, month % 12 + 1, 1).toordinal() - 1)
+                  for month in range(1, 13)]
+        _, seconds = _timed(recurring.counts, *months[0])
+        print(f"  first month             {seconds * 1000:8.1f}")
+        start = time.perf_counter()
+        total = sum(sum(recurring.counts(lo, hi).values()) for lo, hi in months)
+        seconds = (time.perf_counter() - start) / len(months)
+        print(f"  one month (average)     {seconds * 1000:8.1f}"
+              f"  {total // len(months)} occurrences a month")
+        # Expanding from each rule's start must give the same days as
+        # expanding the month alone
+        lo, hi = months[0]
+        ok = all(list(rule.occurrences(lo, hi))
+                 == [day for day in rule.occurrences(rule.start, hi) if day >= lo]
+                 for rule in recurring.rules()[::count // 200 or 1])
+        stored = sum(1 for _ in recurring.iter_days(date(2016, 1, 1).toordinal(),
+                                                    date(2025, 12, 31).toordinal()))
+        print(f"  occurrences 2016-2025 if stored one by one: {stored:,}"
+              f"  {'ok' if ok else 'MONTH EXPANSION MISMATCH'}")
+
+
+def _use_temp_event_files(tmp, count=10_000):
+    """Point event_manager at event files in tmp, away from the real ones,
+    holding ``count`` events"""
+    import event_manager
+    event_manager._store = EventStore(JsonBackend(os.path.join(tmp, "events.json")))
+    event_manager._rules = RecurringEvents(RuleFile(os.path.join(tmp, "rules.json")))
+    event_manager._store.replace(events_from_json(synthetic_events(count)))
+
+
+def bench_month_flips(flips=1000):
+    """Month navigation in the calendar grid: rebuilding the Treeview
+    every time vs updating a pool of week rows"""
+    import calendar
+    import tkinter as tk
+    from tkinter import ttk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Month flips: skipped, Tk cannot start ({e})")
+        return
+    root.withdraw()
+    import calendar_view
+    import event_manager
+    print(f"{flips} month flips (ms per flip):")
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_event_files(tmp)
+        label = tk.Label(root)
+        months = [(2016 + i // 12 % 10, i % 12 + 1) for i in range(flips)]
+
+        def rebuild(table, year, month):
+            # What show_calendar did for every month before MonthGrid
+            for row in table.get_children():
+                table.delete(row)
+            label.config(text=f"{calendar.month_name[month]} {year}")
+            counts = event_manager.get_day_counts(year, month)
+            for i, day in enumerate(calendar_view.DAYS_OF_WEEK):
+                table.heading(str(i), text=day)
+                table.column(str(i), width=78, anchor="center", stretch=False)
+            table.configure(selectmode="none", show="headings")
+            weeks = calendar.monthcalendar(year, month)
+            for week in weeks:
+                table.insert("", "end", values=[f"{day} ({counts[day]})" if day in counts
+                                                else str(day) if day else "" for day in week])
+            table.configure(height=len(weeks))
+            table.bind("<Button-1>", lambda e: None)
+
+        for name in ("rebuild", "row pool"):
+            table = ttk.Treeview(root, columns=[str(i) for i in range(7)], show="headings")
+            if name == "rebuild":
+                show = lambda year, month: rebuild(table, year, month)
+            else:
+                show = calendar_view.MonthGrid(table, label).show
+            start = time.perf_counter()
+            for year, month in months:
+                show(year, month)
+                root.update_idletasks()
+            seconds = time.perf_counter() - start
+            print(f"  {name:9} {seconds * 1000 / flips:8.3f}")
+            table.destroy()
+    root.destroy()
+
+
+def bench_view_switch(switches=200):
+    """Switching sidebar tools: rebuilding the view every time vs raising
+    the one built before"""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"View switching: skipped, Tk cannot start ({e})")
+        return
+    import frame_manager
+
+    class RecordingViews(frame_manager.ViewManager):
+        """ViewManager keeping the builders create_app registers"""
+        builders = {}
+
+        def register(self, name, build):
+            self.builders[name] = build
+            super().register(name, build)
+
+    def rebuilt(name, built):
+        """Builder of a view under a new name, noting the frame built into"""
+        def build(frame):
+            built.append(frame)
+            return RecordingViews.builders[name](frame)
+        return build
+
+    print(f"{switches} view switches (ms per switch):")
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_event_files(tmp)
+        frame_manager.ViewManager, view_manager = RecordingViews, frame_manager.ViewManager
+        try:
+            views = frame_manager.create_app(root)
+        finally:
+            frame_manager.ViewManager = view_manager
+        names = ["main", "weekday", "add", "subtract", "count", "business"]
+        for case in ("rebuild", "kept"):
+            built = []
+            start = time.perf_counter()
+            for i in range(switches):
+                name = names[i % len(names)]
+                if case == "rebuild":
+                    # What every sidebar click did before ViewManager: a
+                    # view built afresh, the one shown before destroyed
+                    views.register(f"{name} {i}", rebuilt(name, built))
+                    views.show(f"{name} {i}")
+                    if len(built) > 1:
+                        built.pop(0).destroy()
+                else:
+                    views.show(name)
+                root.update()
+            seconds = time.perf_counter() - start
+            print(f"  {case:8} {seconds * 1000 / switches:8.2f}")
+    root.destroy()
+
+
+def bench_all_events(counts=(1_000, 10_000, 100_000)):
+    """Opening the All Events window: every event vs its first page"""
+    import tkinter as tk
+    import event_manager
+    print("All Events list (ms):")
+    try:
+        root = tk.Tk()
+        root.withdraw()
+    except tk.TclError as e:
+        root = None
+        print(f"  (window timings skipped, Tk cannot start: {e})")
+    def first_page():
+        return list(itertools.islice(event_manager.iter_events(),
+                                     event_manager.ALL_EVENTS_PAGE_SIZE))
+
+    for count in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            _use_temp_event_files(tmp, count)
+            path = os.path.join(tmp, "events.json")
+
+            def cold_store():
+                # Opened like the app opens it, nothing read yet
+                event_manager._store = EventStore(JsonBackend(path, journal=True, lazy=True))
+
+            # The old window built its rows from the whole list
+            cold_store()
+            _, all_seconds = _timed(event_manager.get_all_events)
+            cold_store()
+            _, cold_seconds = _timed(first_page)
+            # Every event in memory and sorted, as after the first full load
+            event_manager._store.all()
+            first_page()
+            _, warm_seconds = _timed(first_page)
+            line = (f"  {count:7,} events  whole list {all_seconds * 1000:8.1f}"
+                    f"  first page cold {cold_seconds * 1000:6.1f}"
+                    f"  warm {warm_seconds * 1000:6.1f}")
+            if root is not None:
+                start = time.perf_counter()
+                event_manager.show_all_events_window()
+                root.update()
+                line += f"  open window {(time.perf_counter() - start) * 1000:8.1f}"
+                for win in root.winfo_children():
+                    if isinstance(win, tk.Toplevel):
+                        win.destroy()
+            print(line)
+    if root is not None:
+        root.destroy()
+
+
+def _walk_weekdays(d1, d2):
+    """The day by day count calculate_duration_details used to do"""
+    weekdays = weekends = 0
+    current = d1
+    while current <= d2:
+        if current.weekday() < 5:
+            weekdays += 1
+        else:
+            weekends += 1
+        current += timedelta(days=1)
+    return weekdays, weekends
+
+
+def bench_weekdays():
+    """Weekday and weekend counts of the Duration and Business Days tools
+    over spans from a day to two centuries (tests/test_calculators.py
+    checks them against the day by day count)"""
+    print("Weekday counting, ms per call:")
+    d1 = datetime(1900, 1, 1)
+    for years in (1, 10, 100, 200):
+        d2 = datetime(1900 + years, 1, 1)
+        _, walk_seconds = _timed(_walk_weekdays, d1, d2)
+        start = time.perf_counter()
+        for _ in range(1000):
+            calculate_duration_details(d1, d2)
+        seconds = (time.perf_counter() - start) / 1000
+        print(f"  {years:3} years  day by day {walk_seconds * 1000:8.3f}"
+              f"  calculate_duration_details {seconds * 1000:8.4f}")
+
+
+def _walk_business_days(calendar, d1, d2):
+    """Business days from d1 to d2 checked one by one against the holidays"""
+    holidays = set()
+    for year in range(d1.year, d2.year + 1):
+        holidays.update(calendar.holidays(year))
+    return sum(1 for day in range(d1.toordinal(), d2.toordinal() + 1)
+               if (day - 1) % 7 not in calendar.weekend and day not in holidays)
+
+
+def bench_business_days(pairs=500, seed=1):
+    """Business days between two dates and N business days ahead, with
+    holidays, over spans from a day to two centuries"""
+    rng = random.Random(seed)
+    first = date(1900, 1, 1).toordinal()
+    ok = True
+    for weekend in ((5, 6), (4, 5), (6,)):
+        calendar = BusinessCalendar(weekend=weekend)
+        for _ in range(pairs // 3):
+            d1 = date.fromordinal(first + rng.randrange(73_000))
+            d2 = d1 + timedelta(days=rng.choice((rng.randrange(15), rng.randrange(3000))))
+            count = calendar.count(d1, d2)
+            ok = ok and count == _walk_business_days(calendar, d1, d2)
+            # Adding back the business days after d1 must land on d2's
+            # last business day
+            if count:
+                end = calendar.add(d1, count - calendar.is_business_day(d1))
+                ok = ok and end <= d2 and calendar.count(end, d2) == 1
+    print(f"Business days, ms per call  ({pairs} random spans "
+          f"{'ok' if ok else 'MISMATCH WITH THE DAY BY DAY COUNT'}):")
+    d1 = date(1900, 1, 1)
+    for years in (1, 10, 100, 200):
+        d2 = date(1900 + years, 1, 1)
+        calendar = BusinessCalendar()
+        _, walk_seconds = _timed(_walk_business_days, calendar, d1, d2)
+        _, first_seconds = _timed(calendar.count, d1, d2)
+        start = time.perf_counter()
+        for _ in range(1000):
+            calendar.count(d1, d2)
+            calendar.add(d1, years * 250)
+        seconds = (time.perf_counter() - start) / 1000
+        print(f"  {years:3} years  day by day {walk_seconds * 1000:8.3f}"
+              f"  first count {first_seconds * 1000:7.3f}  count + add {seconds * 1000:7.4f}")
+
+
+def bench_batch_dates(rows=1_000_000, seed=1):
+    """The calculators over columns of dates: a loop over the scalar
+    functions vs batch_dates"""
+    rng = random.Random(seed)
+    first = date(2016, 1, 1).toordinal()
+    dates1 = [date.fromordinal(first + rng.randrange(3650)) for _ in range(rows)]
+    dates2 = [date.fromordinal(first + rng.randrange(3650)) for _ in range(rows)]
+    offsets = [rng.randrange(-1000, 1000) for _ in range(rows)]
+    calendar = BusinessCalendar()
+    np = batch_dates.np
+    print(f"Date columns, {rows:,} rows (ms)"
+          + ("" if np is not None else ": NumPy is not installed, batch_dates loops too") + ":")
+
+    def scalar_loop():
+        for d1, d2, n in zip(dates1, dates2, offsets):
+            d1.weekday()
+            get_week_of_year(d1)
+            get_iso_year(d1)
+            d1 + timedelta(days=n)
+            calculate_duration_details(d1, d2)
+            calendar.count(d1, d2)
+
+    def batch(column1, column2, offsets):
+        return (batch_dates.weekdays(column1), batch_dates.iso_weeks(column1),
+                batch_dates.add_days(column1, offsets), batch_dates.durations(column1, column2),
+                batch_dates.business_day_counts(column1, column2, calendar))
+
+    _, seconds = _timed(scalar_loop)
+    print(f"  scalar functions, row by row     {seconds * 1000:9.1f}")
+    results, seconds = _timed(batch, dates1, dates2, offsets)
+    print(f"  batch_dates, date object columns {seconds * 1000:9.1f}")
+    if np is not None:
+        # Columns converted once, as a spreadsheet reader would hand them over
+        columns = [batch_dates.as_days(dates1), batch_dates.as_days(dates2), np.array(offsets)]
+        results, seconds = _timed(batch, *columns)
+        print(f"  batch_dates, datetime64 columns  {seconds * 1000:9.1f}")
+    # The first rows must match the scalar functions
+    weekdays, (iso_years, weeks), added, durations, business_days = results
+    ok = True
+    for i in range(min(rows, 10_000)):
+        d1, d2 = dates1[i], dates2[i]
+        details = calculate_duration_details(d1, d2)
+        new_date = added[i] if np is None else added[i].astype(object)
+        ok = ok and (weekdays[i] == d1.weekday() and iso_years[i] == get_iso_year(d1)
+                     and weeks[i] == get_week_of_year(d1)
+                     and new_date == d1 + timedelta(days=int(offsets[i]))
+                     and all(durations[key][i] == value for key, value in details.items())
+                     and business_days[i] == calendar.count(d1, d2))
+    print(f"  first {min(rows, 10_000):,} rows {'ok' if ok else 'MISMATCH WITH THE SCALAR FUNCTIONS'}")
+
+
+BENCHMARKS = {
+    "event_memory": bench_event_memory,
+    "ics": bench_ics,
+    "lazy_load": bench_lazy_load,
+    "snapshot": bench_snapshot,
+    "sharded": bench_sharded,
+    "concurrency": bench_concurrency,
+    "day_counts": bench_day_counts,
+    "month_flips": bench_month_flips,
+    "view_switch": bench_view_switch,
+    "all_events": bench_all_events,
+    "recurrence": bench_recurrence,
+    "weekdays": bench_weekdays,
+    "business_days": bench_business_days,
+    "batch_dates": bench_batch_dates,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,111 @@
+import json
+import struct
+from itertools import accumulate, islice
+from event_model import Event, parse_date_key
+
+# Layout (all integers little-endian):
+#   header    MAGIC, u32 version
+#   then four sections, each a u64 byte length followed by its payload:
+#   meta      UTF-8 JSON object
+#   strings   u32 count, count x u32 lengths (in characters), UTF-8 text
+#   dates     per date key: u32 string index, u32 event count
+#   events    per event, date by date: EVENT_RECORD
+# Event texts, date keys and unparsable creation times all live in the
+# string table, so a repeated text is stored once.
+MAGIC = b"CALEVTS\x00"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sI")
+_LENGTH = struct.Struct("<Q")
+_COUNT = struct.Struct("<I")
+_DATE_RECORD = struct.Struct("<II")
+# id, text string index, created kind (0 = epoch seconds, 1 = string index), created
+EVENT_RECORD = struct.Struct("<qIBq")
+
+
+def encode_events(events, meta):
+    """Encode {date: [Event, ...]} and a meta dict in the binary format"""
+    strings = {}
+
+    def intern(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    dates = []
+    records = []
+    pack = EVENT_RECORD.pack
+    for date_str, event_list in events.items():
+        dates.append(_DATE_RECORD.pack(intern(date_str), len(event_list)))
+        for event in event_list:
+            if not isinstance(event.id, int) or not isinstance(event.text, str):
+                raise ValueError(f"Event {event.id!r} cannot be stored in the binary format")
+            if isinstance(event.created, str):
+                records.append(pack(event.id, intern(event.text), 1, intern(event.created)))
+            else:
+                records.append(pack(event.id, intern(event.text), 0, event.created))
+
+    table = list(strings)
+    string_section = (_COUNT.pack(len(table))
+                      + struct.pack(f"<{len(table)}I", *map(len, table))
+                      + "".join(table).encode("utf-8"))
+    sections = [json.dumps(meta, ensure_ascii=False).encode("utf-8"),
+                string_section, b"".join(dates), b"".join(records)]
+    out = [_HEADER.pack(MAGIC, FORMAT_VERSION)]
+    for section in sections:
+        out.append(_LENGTH.pack(len(section)))
+        out.append(section)
+    return b"".join(out)
+
+
+def _sections(data):
+    if len(data) < _HEADER.size:
+        raise ValueError("File is too short")
+    magic, version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary events file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary events format version {version}")
+    pos = _HEADER.size
+    sections = []
+    for _ in range(4):
+        (length,) = _LENGTH.unpack_from(data, pos)
+        pos += _LENGTH.size
+        if pos + length > len(data):
+            raise ValueError("File is truncated")
+        sections.append(memoryview(data)[pos:pos + length])
+        pos += length
+    return sections
+
+
+def decode_events(data):
+    """Return ({date: [Event, ...]}, meta) from encode_events() output.
+
+    Raises ValueError if data is not in a format this version can read.
+    """
+    try:
+        meta_section, string_section, date_section, event_section = _sections(data)
+        meta = json.loads(bytes(meta_section).decode("utf-8"))
+
+        (count,) = _COUNT.unpack_from(string_section)
+        lengths = struct.unpack_from(f"<{count}I", string_section, _COUNT.size)
+        text = bytes(string_section[_COUNT.size + 4 * count:]).decode("utf-8")
+        ends = list(accumulate(lengths))
+        strings = [text[end - length:end] for end, length in zip(ends, lengths)]
+
+        dates = list(_DATE_RECORD.iter_unpack(date_section))
+        if sum(event_count for _, event_count in dates) * EVENT_RECORD.size != len(event_section):
+            raise ValueError("Event counts do not match the event records")
+        records = EVENT_RECORD.iter_unpack(event_section)
+        events = {}
+        for key_index, event_count in dates:
+            date_str = strings[key_index]
+            day = parse_date_key(date_str)
+            events[date_str] = [Event(event_id, strings[text_index], day,
+                                      strings[created] if kind else created)
+                                for event_id, text_index, kind, created
+                                in islice(records, event_count)]
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupted binary events file: {e}")
+    return events, meta
@@ -0,0 +1,242 @@
+import bisect
+from array import array
+from calendar import isleap, monthrange
+from collections import OrderedDict
+from datetime import date
+from itertools import accumulate
+from recurrence import weekday
+
+# Weekdays that are not business days, Monday = 0
+WEEKEND = (5, 6)
+# (month, day) of holidays on the same date every year
+FIXED_HOLIDAYS = ((1, 1), (12, 25), (12, 26))
+# Holidays relative to Easter Sunday, in days: Good Friday, Easter Monday
+EASTER_HOLIDAYS = (-2, 1)
+# (month, weekday, n): the nth weekday of the month, counting from the
+# end when n is negative: first Monday in May, last Mondays in May and
+# August
+NTH_WEEKDAY_HOLIDAYS = ((5, 0, 1), (5, 0, -1), (8, 0, -1))
+# Observe fixed holidays falling on the weekend on the next business day
+SUBSTITUTE_HOLIDAYS = True
+# How many years' day tables a BusinessCalendar keeps (least recently
+# used go first)
+YEAR_CACHE_SIZE = 32
+
+
+def easter(year):
+    """Ordinal of Easter Sunday in the Gregorian calendar"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32).toordinal()
+
+
+def nth_weekday(year, month, wd, n):
+    """Ordinal of the nth weekday wd of a month, or None if it has none"""
+    first = date(year, month, 1).toordinal()
+    last = first + monthrange(year, month)[1] - 1
+    if n > 0:
+        day = first + (wd - weekday(first)) % 7 + 7 * (n - 1)
+    else:
+        day = last - (weekday(last) - wd) % 7 + 7 * (n + 1)
+    return day if first <= day <= last else None
+
+
+# ==================== BUSINESS CALENDAR ====================
+
+class BusinessCalendar:
+    """Business days: the days outside ``weekend`` that are not holidays.
+
+    Days are counted through two cumulative tables: for every year, how
+    many business days come before each of its days, and for the years
+    seen so far, how many come before each January 1st. Counting the
+    business days between two dates is then two lookups, and adding N
+    business days a binary search in each table. The years' totals come
+    from the weekday pattern and their few holidays, so a query decades
+    away only builds the day tables of the years it ends in.
+    """
+
+    def __init__(self, weekend=None, fixed=None, easter_offsets=None, nth_weekdays=None,
+                 substitute=None):
+        # Arguments left out come from the module's settings as they are now
+        weekend = WEEKEND if weekend is None else weekend
+        fixed = FIXED_HOLIDAYS if fixed is None else fixed
+        easter_offsets = EASTER_HOLIDAYS if easter_offsets is None else easter_offsets
+        nth_weekdays = NTH_WEEKDAY_HOLIDAYS if nth_weekdays is None else nth_weekdays
+        substitute = SUBSTITUTE_HOLIDAYS if substitute is None else substitute
+        self.weekend = frozenset(weekend)
+        self.fixed = tuple(sorted(fixed))
+        self.easter_offsets = tuple(easter_offsets)
+        self.nth_weekdays = tuple(nth_weekdays)
+        self.substitute = substitute
+        self._workweek = [wd not in self.weekend for wd in range(7)]
+        if not any(self._workweek):
+            raise ValueError("The weekend covers every day of the week")
+        # Business weekdays in the first i days of a week starting Monday
+        self._week_prefix = list(accumulate(self._workweek, initial=0))
+        # Business days before January 1st of _first_year + i
+        self._first_year = None
+        self._starts = []
+        self._tables = OrderedDict()
+
+    def _weekdays_before(self, day):
+        """Days before ``day`` that are not weekend days, ignoring holidays"""
+        weeks, rest = divmod(day - 1, 7)
+        return weeks * self._week_prefix[7] + self._week_prefix[rest]
+
+    def _observed(self, year):
+        """The year's holidays as ordinals, substitutes possibly in the next year"""
+        days = {easter(year) + offset for offset in self.easter_offsets}
+        for month, wd, n in self.nth_weekdays:
+            day = nth_weekday(year, month, wd, n)
+            if day is not None:
+                days.add(day)
+        fixed = [date(year, month, day).toordinal() for month, day in self.fixed
+                 if day <= monthrange(year, month)[1]]
+        if not self.substitute:
+            days.update(fixed)
+            return days
+        # Substitutes go to the next business day no other holiday is on
+        days.update(day for day in fixed if self._workweek[weekday(day)])
+        for day in fixed:
+            if not self._workweek[weekday(day)]:
+                while day in days or not self._workweek[weekday(day)]:
+                    day += 1
+                days.add(day)
+        return days
+
+    def holidays(self, year):
+        """Sorted ordinals of the holidays observed in a year"""
+        first = date(year, 1, 1).toordinal()
+        next_first = first + 365 + isleap(year)
+        days = {day for day in self._observed(year) if day < next_first}
+        if self.substitute and year > 1:
+            days.update(day for day in self._observed(year - 1) if day >= first)
+        return sorted(days)
+
+    def _table(self, year):
+        """Business days before each day of a year, one more for its end"""
+        table = self._tables.get(year)
+        if table is not None:
+            self._tables.move_to_end(year)
+            return table
+        first = date(year, 1, 1).toordinal()
+        days = 365 + isleap(year)
+        start = weekday(first)
+        workweek = self._workweek
+        business = [workweek[(start + i) % 7] for i in range(days)]
+        for day in self.holidays(year):
+            business[day - first] = False
+        table = array('H', accumulate(business, initial=0))
+        self._tables[year] = table
+        if len(self._tables) > YEAR_CACHE_SIZE:
+            self._tables.popitem(last=False)
+        return table
+
+    def _year_total(self, year):
+        first = date(year, 1, 1).toordinal()
+        next_first = first + 365 + isleap(year)
+        holidays = sum(1 for day in self.holidays(year) if self._workweek[weekday(day)])
+        return self._weekdays_before(next_first) - self._weekdays_before(first) - holidays
+
+    def _cover(self, lo, hi):
+        """Extend the year starts to cover years lo to hi"""
+        if self._first_year is None:
+            self._first_year = lo
+            self._starts = [0]
+        if lo < self._first_year:
+            starts = list(accumulate((self._year_total(year) for year in range(lo, self._first_year)),
+                                     initial=0))
+            offset = starts.pop()
+            self._starts = starts + [start + offset for start in self._starts]
+            self._first_year = lo
+        # _starts also holds the start of the year after the last covered
+        year = self._first_year + len(self._starts) - 1
+        while year <= hi:
+            self._starts.append(self._starts[-1] + self._year_total(year))
+            year += 1
+
+    def _position(self, day):
+        """Business days before ``day``, counted from the first covered year"""
+        d = date.fromordinal(day)
+        self._cover(d.year, d.year)
+        first = date(d.year, 1, 1).toordinal()
+        return self._starts[d.year - self._first_year] + self._table(d.year)[day - first]
+
+    def is_business_day(self, day):
+        year = day.year
+        table = self._table(year)
+        i = day.toordinal() - date(year, 1, 1).toordinal()
+        return table[i + 1] > table[i]
+
+    def count(self, d1, d2):
+        """Business days from d1 to d2, both included, in either order"""
+        if d1 > d2:
+            d1, d2 = d2, d1
+        # Both years first, as covering earlier years moves the origin
+        self._cover(d1.year, d2.year)
+        return self._position(d2.toordinal()) - self._position(d1.toordinal()) \
+            + self.is_business_day(d2)
+
+    def weekend_days(self, d1, d2):
+        """Days from d1 to d2, both included, that fall on the weekend"""
+        if d1 > d2:
+            d1, d2 = d2, d1
+        lo, hi = d1.toordinal(), d2.toordinal()
+        return hi - lo + 1 - (self._weekdays_before(hi + 1) - self._weekdays_before(lo))
+
+    def add(self, day, n):
+        """The nth business day after ``day``, or before it when n is
+        negative; ``day`` itself when n is 0"""
+        if n == 0:
+            return date.fromordinal(day.toordinal())
+        day = day.toordinal()
+        # Index of the wanted business day, counted like _position()
+        if n > 0:
+            target = self._position(day) + self.is_business_day(date.fromordinal(day)) + n - 1
+        else:
+            target = self._position(day) + n
+        # Covering earlier years moves the count's origin back with them
+        while target < 0:
+            first = self._first_year
+            if first == 1:
+                raise OverflowError("date value out of range")
+            self._cover(max(1, first - len(self._starts)), first)
+            target += self._starts[first - self._first_year]
+        while target >= self._starts[-1]:
+            last = self._first_year + len(self._starts) - 1
+            if last > date.max.year:
+                raise OverflowError("date value out of range")
+            self._cover(last, min(date.max.year, last + (target - self._starts[-1]) // 200 + 1))
+        index = bisect.bisect_right(self._starts, target) - 1
+        year = self._first_year + index
+        position = bisect.bisect_right(self._table(year), target - self._starts[index]) - 1
+        return date.fromordinal(date(year, 1, 1).toordinal() + position)
+
+
+# The calendar of the settings above, shared by the tools using them
+_default = None
+_default_settings = None
+
+
+def _settings():
+    """This module's settings, copied so later changes can be noticed"""
+    return (frozenset(WEEKEND), tuple(FIXED_HOLIDAYS), tuple(EASTER_HOLIDAYS),
+            tuple(NTH_WEEKDAY_HOLIDAYS), SUBSTITUTE_HOLIDAYS)
+
+
+def default_calendar():
+    """The BusinessCalendar of this module's settings, built again when
+    they have been changed since the last call"""
+    global _default, _default_settings
+    settings = _settings()
+    if settings != _default_settings:
+        _default = BusinessCalendar()
+        _default_settings = settings
+    return _default
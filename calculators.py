@@ -2,6 +2,7 @@ import calendar
 from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import ttk
+from business_days import default_calendar
 from styles import FONT, TITLE_FONT
 
 
@@ -42,6 +43,22 @@ def get_iso_year(date):
     """Return ISO year (might differ from calendar year for week 1)"""
     return date.isocalendar()[0]
 
+
+def count_weekdays(d1, d2):
+    """Return (weekdays, weekend days) from d1 to d2, both included.
+
+    Every full week has five weekdays; the at most six days left over
+    start on d1's weekday, so their weekdays are the part of them that
+    falls on Monday-Friday of this week or the next.
+    """
+    if d1 > d2:
+        d1, d2 = d2, d1
+    total = (d2 - d1).days + 1
+    full_weeks, rest = divmod(total, 7)
+    first = d1.weekday()
+    weekdays = full_weeks * 5 + max(0, min(first + rest, 5) - first) + max(0, first + rest - 7)
+    return weekdays, total - weekdays
+
 def calculate_duration_details(d1, d2):
     if d1 > d2:
         d1, d2 = d2, d1
@@ -63,15 +80,7 @@ def calculate_duration_details(d1, d2):
         days = days_in_prev_month - d1.day + d2.day
     weeks = total_days // 7
     remaining_days = total_days % 7
-    weekdays = 0
-    weekends = 0
-    current = d1
-    while current <= d2:
-        if current.weekday() < 5:
-            weekdays += 1
-        else:
-            weekends += 1
-        current += timedelta(days=1)
+    weekdays, weekends = count_weekdays(d1, d2)
 
     return {
         'total_days': total_days,
@@ -115,7 +124,7 @@ def add_days_function(frame_name, day_spin, month_spin, year_spin, days_entry, r
         )
     except ValueError as e:
         result_label.config(text=f"Error: {str(e)}", foreground="#e74c3c")
-    except Exception as e:
+    except Exception:
         result_label.config(text="Error: Please check the input", foreground="#e74c3c")
 
 def subtract_days_function(frame_name, day_spin, month_spin, year_spin, days_entry, result_label):
@@ -136,7 +145,7 @@ def subtract_days_function(frame_name, day_spin, month_spin, year_spin, days_ent
         )
     except ValueError as e:
         result_label.config(text=f"Error: {str(e)}", foreground="#e74c3c")
-    except Exception as e:
+    except Exception:
         result_label.config(text="Error: Please check the input", foreground="#e74c3c")
 
 def duration_function(frame_name, day_spin, month_spin, year_spin, day_spin2, month_spin2, year_spin2, result_label):
@@ -166,6 +175,9 @@ def working_days_function(frame_name, day_spin, month_spin, year_spin, day_spin2
         if d1 > d2:
             d1, d2 = d2, d1
         duration = calculate_duration_details(d1, d2)
+        business_calendar = default_calendar()
+        business_days = business_calendar.count(d1, d2)
+        weekend_days = business_calendar.weekend_days(d1, d2)
         week1 = get_week_of_year(d1)
         week2 = get_week_of_year(d2)
         iso_year1 = get_iso_year(d1)
@@ -174,14 +186,36 @@ def working_days_function(frame_name, day_spin, month_spin, year_spin, day_spin2
             f"Business Days Calculation:\n\n"
             f"• Period: {d1.strftime('%d/%m/%Y')} (Week {week1} of {iso_year1}) to {d2.strftime('%d/%m/%Y')} (Week {week2} of {iso_year2})\n"
             f"• Total days: {duration['total_days'] + 1}\n"
-            f"• Business days: {duration['weekdays']}\n"
-            f"• Weekend days: {duration['weekends']}\n"
+            f"• Business days: {business_days}\n"
+            f"• Weekend days: {weekend_days}\n"
+            f"• Holidays: {duration['total_days'] + 1 - business_days - weekend_days}\n"
             f"• Duration: {duration['weeks']} weeks, {duration['remaining_days']} days"
         )
         result_label.config(text=result_text, foreground="#27ae60")
     except Exception as e:
         result_label.config(text=f"Error: {str(e)}", foreground="#e74c3c")
 
+def add_business_days_function(frame_name, day_spin, month_spin, year_spin, days_entry, result_label):
+    try:
+        d, corrected_day = get_valid_date(day_spin[frame_name], month_spin[frame_name], year_spin[frame_name])
+        add_text = days_entry[frame_name].get()
+        if not add_text:
+            raise ValueError("Business days field is empty")
+        add = int(add_text)
+        new_date = default_calendar().add(d, add)
+        week_number = get_week_of_year(new_date)
+        iso_year = get_iso_year(new_date)
+        direction = "after" if add >= 0 else "before"
+        result_label.config(
+            text=f"{abs(add)} business days {direction} {d.strftime('%d/%m/%Y')}:\n\n"
+                 f"{new_date.strftime('%A, %B %d, %Y')}\nWeek {week_number} of {iso_year}",
+            foreground="#27ae60"
+        )
+    except ValueError as e:
+        result_label.config(text=f"Error: {str(e)}", foreground="#e74c3c")
+    except Exception:
+        result_label.config(text="Error: Please check the input", foreground="#e74c3c")
+
 def week_calculator_function(frame_name, day_spin, month_spin, year_spin, weeks_spin, extra_days_spin, result_label,
                              add=True):
     try:
@@ -215,7 +249,7 @@ def week_calculator_function(frame_name, day_spin, month_spin, year_spin, weeks_
         )
     except ValueError as e:
         result_label.config(text=f"Error: {str(e)}", foreground="#e74c3c")
-    except Exception as e:
+    except Exception:
         result_label.config(text="Error: Please check the input", foreground="#e74c3c")
 
 def show_week_number_function(frame_name, day_spin, month_spin, year_spin, result_label):
@@ -1,41 +1,95 @@
 import calendar
-from event_manager import get_events_for_date, on_calendar_click
+from collections import OrderedDict
+from event_manager import get_day_counts, on_calendar_click
 from styles import COLORS
 
+DAYS_OF_WEEK = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+# Most weeks a month can span
+WEEK_ROWS = 6
+# How many months' rows a MonthGrid keeps (least recently used go first)
+MONTH_CACHE_SIZE = 24
+
+
+class MonthGrid:
+    """Shows months in a Treeview with one column per weekday.
+
+    Headings, columns and the click binding are set up once and a fixed
+    pool of week rows is reused: showing a month rewrites the values of
+    the rows that changed and detaches the rows it does not need. The
+    rows of recently shown or prefetched months are cached, and reused
+    while the month's event counts stay the same.
+    """
+
+    def __init__(self, cal_table, month_label):
+        self.cal_table = cal_table
+        self.month_label = month_label
+        self.year = None
+        self.month = None
+        for i, day in enumerate(DAYS_OF_WEEK):
+            cal_table.heading(str(i), text=day)
+            cal_table.column(str(i), width=78, anchor="center", stretch=False)
+        cal_table.configure(selectmode="none", show="headings", height=WEEK_ROWS)
+        cal_table.delete(*cal_table.get_children())
+        self._rows = [cal_table.insert("", "end", values=[""] * 7) for _ in range(WEEK_ROWS)]
+        self._values = [None] * WEEK_ROWS
+        self.weeks = WEEK_ROWS
+        # (year, month) -> (event counts, row values)
+        self._cache = OrderedDict()
+        cal_table.bind("<Button-1>", self._on_click)
+
+    def _on_click(self, event):
+        if self.year is not None:
+            on_calendar_click(event, self.year, self.month, self.cal_table)
+
+    def _month_rows(self, year, month):
+        counts = get_day_counts(year, month)
+        key = (year, month)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == counts:
+            self._cache.move_to_end(key)
+            return cached[1]
+        rows = [tuple("" if day == 0 else f"{day} ({counts[day]})" if day in counts else str(day)
+                      for day in week)
+                for week in calendar.monthcalendar(year, month)]
+        self._cache[key] = (counts, rows)
+        self._cache.move_to_end(key)
+        if len(self._cache) > MONTH_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return rows
+
+    def prefetch(self, year, month):
+        """Load a month's event counts and build its rows ahead of show()"""
+        if 1 <= year <= 9999:
+            self._month_rows(year, month)
+
+    def show(self, year, month):
+        try:
+            if month < 1 or month > 12:
+                month = max(1, min(12, month))
+            if year < 1 or year > 9999:
+                year = max(1, min(9999, year))
+        except (TypeError, ValueError):
+            from datetime import datetime
+            today = datetime.now()
+            year, month = today.year, today.month
+        self.year, self.month = year, month
+        self.month_label.config(text=f"{calendar.month_name[month]} {year}", fg=COLORS['primary'])
+        # Event count badges, from one lookup for the whole month
+        cal = self._month_rows(year, month)
+        cal_table = self.cal_table
+        for i, values in enumerate(cal):
+            if values != self._values[i]:
+                cal_table.item(self._rows[i], values=values)
+                self._values[i] = values
+        if len(cal) != self.weeks:
+            for i, row in enumerate(self._rows):
+                if i < len(cal):
+                    cal_table.move(row, "", i)
+                else:
+                    cal_table.detach(row)
+            cal_table.configure(height=len(cal))
+            self.weeks = len(cal)
 
-def show_calendar(year, month, cal_table, month_label):
-    try:
-        if month < 1 or month > 12:
-            month = max(1, min(12, month))
-        if year < 1 or year > 9999:
-            year = max(1, min(9999, year))
-    except (TypeError, ValueError):
-        from datetime import datetime
-        today = datetime.now()
-        year, month = today.year, today.month
-    for row in cal_table.get_children():
-        cal_table.delete(row)
-    month_label.config(text=f"{calendar.month_name[month]} {year}", fg=COLORS['primary'])
-    cal = calendar.monthcalendar(year, month)
-    while cal and all(day == 0 for day in cal[0]):
-        cal.pop(0)
-    while cal and all(day == 0 for day in cal[-1]):
-        cal.pop()
-    days_of_week = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    for i, day in enumerate(days_of_week):
-        cal_table.heading(str(i), text=day)
-        cal_table.column(str(i), width=78, anchor="center", stretch=False)
-    cal_table.configure(selectmode="none", show="headings")
-    for week in cal:
-        values = []
-        for day in week:
-            if day == 0:
-                values.append("")
-            else:
-                values.append(str(day))
-        cal_table.insert("", "end", values=values)
-    cal_table.configure(height=len(cal))
-    cal_table.bind("<Button-1>", lambda e: on_calendar_click(e, year, month, cal_table))
 
 def prev_month(y, m):
     return (y - 1, 12) if m == 1 else (y, m - 1)
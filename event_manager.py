@@ -1,118 +1,327 @@
+import atexit
+import heapq
+import json
 import tkinter as tk
-from tkinter import ttk, messagebox
-from datetime import datetime
-import json, os
+from calendar import monthrange
+from itertools import islice
+from tkinter import ttk, messagebox, filedialog
+from datetime import date, datetime
 from styles import COLORS
-
+from event_model import Event, parse_date_key
+from event_store import RESET, EventStore
+from ical import iter_export, iter_import
+from recurrence import FREQUENCIES, Occurrence, RecurringEvents
+from storage import (BinaryBackend, JsonBackend, RuleFile, ShardedBackend, SqliteBackend,
+                     events_from_json, events_to_json)
+
+# Where events are kept: "json" (EVENTS_FILE), "binary" (EVENTS_BIN),
+# "sharded" (one file per month in EVENTS_DIR) or "sqlite" (EVENTS_DB)
+STORAGE_BACKEND = "json"
 EVENTS_FILE = "calendar_events.json"
+EVENTS_BIN = "calendar_events.bin"
+EVENTS_DIR = "calendar_events"
+EVENTS_DB = "calendar_events.db"
+# Append mutations to a journal next to EVENTS_FILE instead of rewriting it
+EVENTS_JOURNAL = True
+# Read single dates from EVENTS_FILE through a byte-offset index instead
+# of parsing the whole file
+EVENTS_LAZY_LOAD = True
+# Recurring events, stored as one rule each and expanded when displayed
+RULES_FILE = "calendar_rules.json"
+# How many days past today recurring events are listed in All Events
+RECURRING_LIST_DAYS = 365
+
 open_event_windows = {}
+# Delay between the last keystroke in a search box and running the search
+SEARCH_DEBOUNCE_MS = 200
+# Rows added to the All Events list each time its end is scrolled into view
+ALL_EVENTS_PAGE_SIZE = 200
+# Events committed (import) or written (export) per .ics step
+ICS_BATCH_SIZE = 1000
 
 
 # ==================== BASIC EVENT FUNCTIONS ====================
 
-def load_events():
-    """Load all events from file"""
-    if not os.path.exists(EVENTS_FILE):
-        return {}
+def _show_storage_error(message):
+    messagebox.showerror("Error", message)
 
-    try:
-        with open(EVENTS_FILE, "r", encoding="utf-8") as f:
-            content = f.read()
-            if not content.strip():
-                return {}
-            return json.loads(content)
-    except json.JSONDecodeError:
-        messagebox.showerror("Error", f"Events file '{EVENTS_FILE}' is corrupted. Creating new file.")
-        return {}
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to load events: {str(e)}")
-        return {}
+
+def _create_backend():
+    if STORAGE_BACKEND == "sqlite":
+        # The first run imports the existing JSON events file
+        return SqliteBackend(EVENTS_DB, migrate_from=EVENTS_FILE)
+    if STORAGE_BACKEND == "binary":
+        return BinaryBackend(EVENTS_BIN, journal=EVENTS_JOURNAL, migrate_from=EVENTS_FILE)
+    if STORAGE_BACKEND == "sharded":
+        return ShardedBackend(EVENTS_DIR, migrate_from=EVENTS_FILE)
+    return JsonBackend(EVENTS_FILE, journal=EVENTS_JOURNAL, lazy=EVENTS_LAZY_LOAD)
+
+
+def _run_on_ui_thread(callback):
+    tk._default_root.after(0, callback)
+
+
+# Shared cache used by every function below; writes happen on a
+# background thread so saving never blocks the Tk main loop
+_store = EventStore(_create_backend(), on_error=_show_storage_error,
+                    background=True, dispatch=_run_on_ui_thread)
+_rules = RecurringEvents(RuleFile(RULES_FILE), on_error=_show_storage_error)
+
+
+def close_event_store():
+    """Wait for pending writes to finish (call before the app exits)"""
+    _store.close()
+
+
+# The writer thread is a daemon, so without this a script that never
+# calls close_event_store() would exit with its writes still queued
+atexit.register(close_event_store)
+
+
+# ==================== CHANGE FEED ====================
+
+# Callbacks of subscribe_changes() and the changes not yet given to them.
+# A recurring event's changes carry ("rule", rule ID) as the event ID, and
+# date None when every date of the rule is affected.
+_change_listeners = []
+_pending_changes = []
+
+
+def subscribe_changes(callback):
+    """Call callback(changes) on the Tk thread after events change, as EventStore.subscribe() does"""
+    _change_listeners.append(callback)
+
+
+def unsubscribe_changes(callback):
+    if callback in _change_listeners:
+        _change_listeners.remove(callback)
+
+
+def _publish_changes(changes):
+    root = tk._default_root
+    if root is None:
+        _pending_changes.extend(changes)
+        _deliver_changes()
+        return
+    # Everything published until Tk is idle goes out as one batch
+    if not _pending_changes:
+        root.after_idle(_deliver_changes)
+    _pending_changes.extend(changes)
+
+
+def _deliver_changes():
+    changes = list(_pending_changes)
+    del _pending_changes[:]
+    for callback in list(_change_listeners):
+        callback(changes)
+
+
+_store.subscribe(_publish_changes)
+
+
+def load_events():
+    """Load all events as plain {date: [event dict, ...]} data"""
+    return events_to_json(_store.all())
 
 
 def save_events(events):
-    """Save events to file"""
-    try:
-        with open(EVENTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(events, f, indent=4, ensure_ascii=False)
-        return True
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to save events: {str(e)}")
-        return False
+    """Save events given as {date: [event dict, ...]}"""
+    return _store.replace(events_from_json(events))
+
+
+def export_events_json(path):
+    """Write every event to a plain JSON events file, whatever the backend"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(events_to_json(_store.all()), f, indent=4, ensure_ascii=False)
 
 
 def add_event(date_str, text):
-    """Add an event for a specific date"""
+    """Add an event for a specific date and return its ID (False on failure)"""
     if not text.strip():
         return False
 
-    events = load_events()
+    return _store.add(date_str, text.strip()) or False
 
-    # Get next available ID for this date
-    existing_events = events.get(date_str, [])
-    next_id = max([e['id'] for e in existing_events], default=0) + 1
 
-    events.setdefault(date_str, []).append({
-        "id": next_id,
-        "text": text.strip(),
-        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M")
-    })
-
-    return save_events(events)
+def get_events_for_date(date_str):
+    """Return events for a specific date, recurring ones (Occurrences) last"""
+    events = list(_store.events_for_date(date_str))
+    day = parse_date_key(date_str)
+    if day is not None:
+        events.extend(_rules.occurrences_on(day))
+    return events
 
 
-def get_events_for_date(date_str):
-    """Return events for a specific date"""
-    events = load_events()
-    return events.get(date_str, [])
+def _newest_first(events):
+    """Sort Events by date and creation time, newest first"""
+    return sorted((event for event in events if event.day is not None),
+                  key=Event.sort_key, reverse=True)
 
 
 def get_all_events():
     """Return all events sorted by date (newest first)"""
-    events = load_events()
-    all_events = []
-    date_cache = {}
-    for date_str, event_list in events.items():
-        if date_str not in date_cache:
-            try:
-                date_cache[date_str] = datetime.strptime(date_str, "%Y-%m-%d")
-            except ValueError:
-                continue
-        date_obj = date_cache[date_str]
-        for event in event_list:
-            try:
-                created_time = datetime.strptime(event['created_at'], "%Y-%m-%d %H:%M")
-            except ValueError:
-                created_time = datetime.now()
-            all_events.append({
-                'date': date_str,
-                'date_obj': date_obj,
-                'text': event.get('text', ''),
-                'created': created_time.strftime("%Y-%m-%d %H:%M"),
-                'created_obj': created_time
-            })
-    all_events.sort(key=lambda x: (x['date_obj'], x['created_obj']), reverse=True)
-    return all_events
+    return list(iter_events())
+
+
+def iter_events(reverse=True, start=None, limit=None):
+    """Iterate events newest first (by default) from ``start``, at most ``limit`` of them"""
+    start = None if start is None else _date_key(start)
+    stored = _store.iter_events(reverse=reverse, start=start, limit=limit)
+    last = date.today().toordinal() + RECURRING_LIST_DAYS
+    start_day = None if start is None else parse_date_key(start)
+    if reverse:
+        recurring = _rules.occurrences(1, last if start_day is None else min(start_day, last),
+                                       reverse=True)
+    else:
+        recurring = _rules.occurrences(1 if start_day is None else start_day, last)
+    return islice(heapq.merge(stored, recurring, key=Event.sort_key, reverse=reverse), limit)
+
+
+def search_events(query):
+    """Return events with words starting with every word of query, newest first"""
+    return _newest_first(event for _, event in _store.search(query))
+
+
+def _date_key(value):
+    """Return the events key for a date, datetime or 'YYYY-MM-DD' string"""
+    if isinstance(value, str):
+        return value
+    return f"{value.year}-{value.month:02d}-{value.day:02d}"
+
+
+def get_events_in_range(start, end):
+    """Return {date: [event, ...]} for every date from start to end (inclusive)"""
+    return _store.events_in_range(_date_key(start), _date_key(end))
+
+
+def get_events_for_month(year, month):
+    """Return {date: [event, ...]} for one month"""
+    return _store.events_in_range(f"{year}-{month:02d}-01", f"{year}-{month:02d}-31")
+
+
+def get_day_counts(year, month):
+    """Return {day of month: number of events} for one month, recurring events included"""
+    counts = dict(_store.day_counts(year, month))
+    for day, count in get_recurring_days(year, month).items():
+        counts[day] = counts.get(day, 0) + count
+    return counts
 
 
 def delete_event(date_str, event_index):
     """Delete an event for a specific date"""
-    events = load_events()
+    return _store.delete(date_str, event_index)
+
+
+def delete_event_by_id(event_id):
+    """Delete the event with this ID"""
+    return _store.delete_by_id(event_id)
+
 
-    if date_str not in events:
+def add_recurring_event(date_str, text, freq, interval=1, byweekday=None, until=None, count=None):
+    """Add an event repeating every ``interval`` periods and return its rule ID (False on failure)"""
+    if not text.strip():
         return False
 
-    if 0 <= event_index < len(events[date_str]):
-        deleted_event = events[date_str].pop(event_index)
-        if not events[date_str]:
-            del events[date_str]
-        else:
-            # Re-index IDs for remaining events (optional but good for consistency)
-            for i, event in enumerate(events[date_str]):
-                event['id'] = i + 1
+    rule_id = _rules.add(date_str, text.strip(), freq, interval, byweekday, until, count)
+    if rule_id is None:
+        return False
+    _publish_changes([(None, ("rule", rule_id), "add")])
+    return rule_id
+
+
+def add_recurring_events(rules):
+    """Add rule file dicts without an ``id`` and return how many were saved"""
+    rule_ids = _rules.add_many(rules)
+    if not rule_ids:
+        return 0
+    _publish_changes([(None, ("rule", rule_id), "add") for rule_id in rule_ids])
+    return len(rule_ids)
+
+
+def delete_recurring_event(rule_id):
+    """Delete a recurring event and all its occurrences"""
+    deleted = _rules.delete(rule_id)
+    if deleted:
+        _publish_changes([(None, ("rule", rule_id), "delete")])
+    return deleted
+
 
-        return save_events(events)
+def skip_occurrence(rule_id, date_str):
+    """Remove one date from a recurring event"""
+    skipped = _rules.skip(rule_id, date_str)
+    if skipped:
+        _publish_changes([(date_str, ("rule", rule_id), "delete")])
+    return skipped
 
-    return False
+
+def get_recurring_days(year, month):
+    """Return {day of month: number of recurring events} for one month"""
+    first = date(year, month, 1).toordinal()
+    last = first + monthrange(year, month)[1] - 1
+    return {day - first + 1: count for day, count in _rules.counts(first, last).items()}
+
+
+def update_event_by_id(event_id, text=None, date_str=None):
+    """Change an event's text and/or move it to another date"""
+    if text is not None:
+        text = text.strip()
+        if not text:
+            return False
+    return _store.update_by_id(event_id, text=text, date_str=date_str)
+
+
+# ==================== ICALENDAR IMPORT / EXPORT ====================
+
+def iter_import_ics(path, batch_size=ICS_BATCH_SIZE):
+    """Import the VEVENTs of an .ics file in batches, yielding the running count"""
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        yield from iter_import(f, _store.add_many, batch_size, add_recurring_events)
+
+
+def iter_export_ics(path, batch_size=ICS_BATCH_SIZE):
+    """Write every event to an .ics file, recurring ones as RRULEs, yielding the running count"""
+    # The UI exports a batch at a time, so walk the order as it was at the start
+    events = _store.iter_events(reverse=False, snapshot=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        yield from iter_export(events, f, batch_size, _rules.rules())
+
+
+def _run_to_end(steps, progress):
+    count = 0
+    for count in steps:
+        if progress is not None:
+            progress(count)
+    return count
+
+
+def import_ics(path, progress=None):
+    """Import an .ics file and return how many events were added"""
+    return _run_to_end(iter_import_ics(path), progress)
+
+
+def export_ics(path, progress=None):
+    """Export every event to an .ics file and return how many were written"""
+    return _run_to_end(iter_export_ics(path), progress)
+
+
+# Choices of the event dialog's Repeat menu: no repeat, then FREQUENCIES
+REPEAT_CHOICES = ("Does not repeat", "Daily", "Weekly", "Monthly", "Yearly")
+
+
+def delete_listed_event(event, parent=None):
+    """Delete an event shown in a list; returns None if the user cancels"""
+    if not isinstance(event, Occurrence):
+        return delete_event_by_id(event.id)
+    answer = messagebox.askyesnocancel(
+        "Recurring Event",
+        f"'{event.text}' repeats.\n\n"
+        f"Yes: delete every occurrence\nNo: remove only {event.date_obj.strftime('%d %B %Y')}",
+        parent=parent)
+    if answer is None:
+        return None
+    if answer:
+        return delete_recurring_event(event.rule.id)
+    return skip_occurrence(event.rule.id, event.date)
 
 
 def cleanup_closed_windows():
@@ -146,7 +355,7 @@ def show_event_dialog(date_str, date_obj):
 
     win = tk.Toplevel()
     win.title(f"Events for {date_obj.strftime('%A, %d %B %Y')}")
-    win.geometry("400x450")
+    win.geometry("400x520")
     win.configure(bg=COLORS['background'])
     win.update_idletasks()
     width = win.winfo_width()
@@ -156,6 +365,7 @@ def show_event_dialog(date_str, date_obj):
     win.geometry(f'{width}x{height}+{x}+{y}')
     open_event_windows[date_str] = win
     def on_close():
+        unsubscribe_changes(on_events_changed)
         if date_str in open_event_windows:
             try:
                 del open_event_windows[date_str]
@@ -170,49 +380,92 @@ def show_event_dialog(date_str, date_obj):
              fg=COLORS['primary']).pack(pady=(0, 15))
     events_frame = tk.Frame(main_frame, bg=COLORS['card_bg'], relief="solid", bd=1)
     events_frame.pack(fill="both", expand=True, pady=(0, 15))
-    events_list = get_events_for_date(date_str)
-    if events_list:
-        canvas = tk.Canvas(events_frame, bg=COLORS['card_bg'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(events_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=COLORS['card_bg'])
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        tk.Label(scrollable_frame, text="Existing Events:",
-                 font=("Segoe UI", 10, "bold"), bg=COLORS['card_bg']).pack(anchor="w", padx=10, pady=5)
-        for i, e in enumerate(events_list):
-            event_frame = tk.Frame(scrollable_frame, bg=COLORS['card_bg'])
+    canvas = tk.Canvas(events_frame, bg=COLORS['card_bg'], highlightthickness=0)
+    scrollbar = ttk.Scrollbar(events_frame, orient="vertical", command=canvas.yview)
+    scrollable_frame = tk.Frame(canvas, bg=COLORS['card_bg'])
+    scrollable_frame.bind(
+        "<Configure>",
+        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+    )
+    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+    canvas.configure(yscrollcommand=scrollbar.set)
+    tk.Label(scrollable_frame, text="Existing Events:",
+             font=("Segoe UI", 10, "bold"), bg=COLORS['card_bg']).pack(anchor="w", padx=10, pady=5)
+    empty_label = tk.Label(scrollable_frame, text="No events for this date",
+                           font=("Segoe UI", 9, "italic"), bg=COLORS['card_bg'],
+                           fg=COLORS['dark_gray'])
+    canvas.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+
+    # Event ID (("rule", rule ID) for an occurrence) -> (its row frame,
+    # the text shown)
+    rows = {}
+
+    def row_key(event):
+        return ("rule", event.rule.id) if isinstance(event, Occurrence) else event.id
+
+    def make_row(e, before):
+        event_frame = tk.Frame(scrollable_frame, bg=COLORS['card_bg'])
+        if before is None:
             event_frame.pack(fill="x", padx=10, pady=2)
-            tk.Label(event_frame, text="•", fg=COLORS['primary'],
-                     bg=COLORS['card_bg'], font=("Segoe UI", 12)).pack(side="left")
-            tk.Label(event_frame, text=f" {e['text']}",
-                     bg=COLORS['card_bg'], font=("Segoe UI", 9), wraplength=250).pack(side="left", padx=5, fill="x", expand=True)
-            del_btn = tk.Button(event_frame, text="✕",
-                                command=lambda d=date_str, idx=i: delete_and_refresh(d, idx),
-                                bg="#fee2e2", fg="#dc2626",
-                                font=("Segoe UI", 8, "bold"),
-                                bd=0, width=2, height=1,
-                                cursor="hand2")
-            del_btn.pack(side="right", padx=5)
-
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-    else:
-        tk.Label(events_frame, text="No events for this date",
-                 font=("Segoe UI", 9, "italic"), bg=COLORS['card_bg'],
-                 fg=COLORS['dark_gray']).pack(expand=True, pady=20)
-
-    def delete_and_refresh(del_date_str, del_index):
-        """Delete an event and reload the window"""
-        if delete_event(del_date_str, del_index):
-            messagebox.showinfo("Success", "Event deleted!")
-            on_close()
-            show_event_dialog(date_str, date_obj)
         else:
-            messagebox.showerror("Error", "Failed to delete event!")
+            event_frame.pack(fill="x", padx=10, pady=2, before=before)
+        tk.Label(event_frame, text="↻" if isinstance(e, Occurrence) else "•", fg=COLORS['primary'],
+                 bg=COLORS['card_bg'], font=("Segoe UI", 12)).pack(side="left")
+        tk.Label(event_frame, text=f" {e.text}",
+                 bg=COLORS['card_bg'], font=("Segoe UI", 9), wraplength=250).pack(side="left", padx=5, fill="x", expand=True)
+        del_btn = tk.Button(event_frame, text="✕",
+                            command=lambda event=e: delete_and_refresh(event),
+                            bg="#fee2e2", fg="#dc2626",
+                            font=("Segoe UI", 8, "bold"),
+                            bd=0, width=2, height=1,
+                            cursor="hand2")
+        del_btn.pack(side="right", padx=5)
+        return event_frame
+
+    def sync_rows():
+        """Add, remove and rebuild rows until the list matches the date's events"""
+        events_list = get_events_for_date(date_str)
+        keys = [row_key(e) for e in events_list]
+        for key in set(rows) - set(keys):
+            rows.pop(key)[0].destroy()
+        following = None
+        for key, e in reversed(list(zip(keys, events_list))):
+            if key in rows and rows[key][1] != e.text:
+                # Edited since the row was made
+                rows.pop(key)[0].destroy()
+            if key not in rows:
+                rows[key] = (make_row(e, following), e.text)
+            following = rows[key][0]
+        if rows:
+            empty_label.pack_forget()
+        else:
+            empty_label.pack(pady=20)
+
+    sync_rows()
+
+    def on_events_changed(changes):
+        # Also catches changes made elsewhere, e.g. in the All Events list
+        if not win.winfo_exists():
+            unsubscribe_changes(on_events_changed)
+        elif any(changed is None or changed == date_str for changed, _, _ in changes):
+            sync_rows()
+
+    subscribe_changes(on_events_changed)
+
+    def set_status(text, error=False):
+        status_label.config(text=text, fg="#dc2626" if error else COLORS['dark_gray'])
+
+    def delete_and_refresh(event):
+        """Delete an event and remove its row"""
+        deleted = delete_listed_event(event, win)
+        if deleted is None:
+            return
+        if deleted:
+            # The row goes when the change reaches on_events_changed
+            set_status("Event deleted")
+        else:
+            set_status("Failed to delete event!", error=True)
     add_frame = tk.Frame(main_frame, bg=COLORS['card_bg'], relief="solid", bd=1)
     add_frame.pack(fill="x", pady=(0, 15))
     tk.Label(add_frame, text="Add New Event:",
@@ -220,6 +473,17 @@ def show_event_dialog(date_str, date_obj):
     entry = tk.Entry(add_frame, width=35, font=("Segoe UI", 10),
                      bg=COLORS['input_bg'], bd=1, relief="solid")
     entry.pack(pady=5, padx=10)
+    repeat_frame = tk.Frame(add_frame, bg=COLORS['card_bg'])
+    repeat_frame.pack(pady=2)
+    tk.Label(repeat_frame, text="Repeat:", font=("Segoe UI", 9),
+             bg=COLORS['card_bg']).pack(side="left")
+    repeat_var = tk.StringVar(value=REPEAT_CHOICES[0])
+    tk.OptionMenu(repeat_frame, repeat_var, *REPEAT_CHOICES).pack(side="left", padx=5)
+    tk.Label(repeat_frame, text="every", font=("Segoe UI", 9),
+             bg=COLORS['card_bg']).pack(side="left")
+    interval_var = tk.StringVar(value="1")
+    tk.Spinbox(repeat_frame, from_=1, to=99, width=3, textvariable=interval_var,
+               font=("Segoe UI", 9)).pack(side="left", padx=5)
     tk.Label(add_frame, text="Event will be saved for this date",
              font=("Segoe UI", 8, "italic"), bg=COLORS['card_bg'],
              fg=COLORS['dark_gray']).pack(pady=2)
@@ -228,17 +492,27 @@ def show_event_dialog(date_str, date_obj):
         """Add a new event"""
         text = entry.get().strip()
         if not text:
-            messagebox.showwarning("Warning", "Please enter event text!")
+            set_status("Please enter event text!", error=True)
             entry.focus_set()
             return
 
-        if add_event(date_str, text):
-            messagebox.showinfo("Success", "Event added successfully!")
-            on_close()
-            # Reopen window with updated list
-            show_event_dialog(date_str, date_obj)
+        repeat = REPEAT_CHOICES.index(repeat_var.get())
+        if repeat:
+            try:
+                interval = int(interval_var.get())
+            except ValueError:
+                interval = 0
+            if interval < 1:
+                set_status("Please enter how often it repeats!", error=True)
+                return
+            added = add_recurring_event(date_str, text, FREQUENCIES[repeat - 1], interval)
+        else:
+            added = add_event(date_str, text)
+        if added:
+            entry.delete(0, tk.END)
+            set_status("Event added")
         else:
-            messagebox.showerror("Error", "Failed to add event!")
+            set_status("Failed to add event!", error=True)
 
     # Add button
     add_btn = tk.Button(main_frame, text="➕ Add Event", command=add,
@@ -248,6 +522,11 @@ def show_event_dialog(date_str, date_obj):
                         cursor="hand2")
     add_btn.pack(pady=10)
 
+    # Outcome of the last add or delete, instead of a popup to dismiss
+    status_label = tk.Label(main_frame, text="", font=("Segoe UI", 9),
+                            bg=COLORS['background'], fg=COLORS['dark_gray'])
+    status_label.pack()
+
     # Close button
     close_btn = tk.Button(main_frame, text="Close", command=on_close,
                           bg=COLORS['light_gray'], fg=COLORS['text_dark'],
@@ -282,7 +561,8 @@ def on_calendar_click(event, year, month, cal_table):
         if col_idx >= len(values) or not values[col_idx]:
             return
 
-        day = int(values[col_idx])
+        # Days with events read e.g. "12 (3)"
+        day = int(values[col_idx].split()[0])
         date_str = f"{year}-{month:02d}-{day:02d}"
         date_obj = datetime(year, month, day)
 
@@ -331,12 +611,8 @@ def show_all_events_window():
              font=("Segoe UI", 18, "bold"), bg=COLORS['background'],
              fg=COLORS['primary']).pack(pady=(0, 15))
 
-    # Statistics
-    all_events = get_all_events()
-    events_dict = load_events()
-    total_events = sum(len(events) for events in events_dict.values())
-    unique_dates = len(events_dict)
-
+    # Statistics, counted once the window is on screen: on most backends
+    # counting reads every event
     stats_frame = tk.Frame(main_frame, bg=COLORS['light_gray'], relief="solid", bd=1)
     stats_frame.pack(fill="x", pady=(0, 15))
 
@@ -346,130 +622,307 @@ def show_all_events_window():
     stats_text = tk.Frame(stats_frame, bg=COLORS['light_gray'])
     stats_text.pack(fill="x", padx=10, pady=5)
 
-    tk.Label(stats_text, text=f"• Total events: {total_events}",
-             font=("Segoe UI", 10), bg=COLORS['light_gray'], fg=COLORS['text_dark']).pack(anchor="w")
-    tk.Label(stats_text, text=f"• Dates with events: {unique_dates}",
-             font=("Segoe UI", 10), bg=COLORS['light_gray'], fg=COLORS['text_dark']).pack(anchor="w")
-
-    if total_events > 0:
-        # Frame for events list
-        list_frame = tk.Frame(main_frame, bg=COLORS['card_bg'], relief="solid", bd=1)
-        list_frame.pack(fill="both", expand=True, pady=(0, 15))
-
-        # Canvas with scrollbar
-        canvas = tk.Canvas(list_frame, bg=COLORS['card_bg'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=COLORS['card_bg'])
-
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        # Header
-        header_frame = tk.Frame(scrollable_frame, bg=COLORS['header_bg'])
-        header_frame.pack(fill="x", pady=(5, 2), padx=5)
-
-        tk.Label(header_frame, text="Date", width=12,
-                 font=("Segoe UI", 9, "bold"), bg=COLORS['header_bg'],
-                 fg=COLORS['text_dark']).pack(side="left", padx=5)
-        tk.Label(header_frame, text="Event", width=45,
-                 font=("Segoe UI", 9, "bold"), bg=COLORS['header_bg'],
-                 fg=COLORS['text_dark']).pack(side="left", padx=5)
-        tk.Label(header_frame, text="Added", width=10,
-                 font=("Segoe UI", 9, "bold"), bg=COLORS['header_bg'],
-                 fg=COLORS['text_dark']).pack(side="left", padx=5)
-
-        # Separator
-        tk.Frame(scrollable_frame, bg=COLORS['border'], height=1).pack(fill="x", pady=2)
-
-        # Events list
-        for event in all_events:
-            event_frame = tk.Frame(scrollable_frame, bg=COLORS['card_bg'])
-            event_frame.pack(fill="x", pady=2, padx=5)
-
-            # Date (blue for events)
-            date_label = tk.Label(event_frame,
-                                  text=event['date_obj'].strftime("%d %b %Y"),
-                                  font=("Segoe UI", 9), bg=COLORS['card_bg'],
-                                  fg=COLORS['primary'], width=12)
-            date_label.pack(side="left", padx=5)
-
-            # Event
-            event_label = tk.Label(event_frame, text=event['text'],
-                                   font=("Segoe UI", 9), bg=COLORS['card_bg'],
-                                   fg=COLORS['text_dark'], width=45,
-                                   wraplength=350, justify="left")
-            event_label.pack(side="left", padx=5, fill="x", expand=True)
-
-            # Time added
-            created_time = event['created_obj'] if 'created_obj' in event else datetime.now()
-            time_label = tk.Label(event_frame,
-                                  text=created_time.strftime("%H:%M"),
-                                  font=("Segoe UI", 8), bg=COLORS['card_bg'],
-                                  fg=COLORS['dark_gray'], width=10)
-            time_label.pack(side="left", padx=5)
-
-            # Delete button
-            del_btn = tk.Button(event_frame, text="🗑️",
-                                command=lambda d=event['date'], txt=event['text']: delete_event_from_all(d, txt, win),
-                                bg="#fee2e2", fg="#dc2626",
-                                font=("Segoe UI", 8),
-                                bd=0, width=3,
-                                cursor="hand2")
-            del_btn.pack(side="right", padx=5)
-
-        canvas.pack(side="left", fill="both", expand=True, padx=5, pady=5)
-        scrollbar.pack(side="right", fill="y")
-    else:
-        # No events message
-        no_events_frame = tk.Frame(main_frame, bg=COLORS['card_bg'], relief="solid", bd=1)
-        no_events_frame.pack(fill="both", expand=True, pady=(0, 15))
+    stat_labels = []
+    for _ in range(3):
+        label = tk.Label(stats_text, text="", font=("Segoe UI", 10),
+                         bg=COLORS['light_gray'], fg=COLORS['text_dark'])
+        label.pack(anchor="w")
+        stat_labels.append(label)
+
+    def show_stats():
+        if not win.winfo_exists():
+            return
+        stat_labels[0].config(text=f"• Total events: {_store.event_count()}")
+        stat_labels[1].config(text=f"• Dates with events: {_store.date_count()}")
+        stat_labels[2].config(text=f"• Recurring events: {len(_rules.rules())}")
+
+    # Search box
+    search_frame = tk.Frame(main_frame, bg=COLORS['background'])
+    search_frame.pack(fill="x", pady=(0, 10))
+
+    tk.Label(search_frame, text="🔍 Search:",
+             font=("Segoe UI", 10), bg=COLORS['background'],
+             fg=COLORS['text_dark']).pack(side="left", padx=(0, 5))
+    search_var = tk.StringVar()
+    search_entry = tk.Entry(search_frame, textvariable=search_var,
+                            font=("Segoe UI", 10), bg=COLORS['input_bg'],
+                            bd=1, relief="solid")
+    search_entry.pack(side="left", fill="x", expand=True)
+    result_count_label = tk.Label(search_frame, text="",
+                                  font=("Segoe UI", 9), bg=COLORS['background'],
+                                  fg=COLORS['dark_gray'])
+    result_count_label.pack(side="left", padx=5)
+
+    # Events list: a Treeview filled a page at a time as it is scrolled,
+    # so opening costs one page of rows whatever the number of events
+    list_frame = tk.Frame(main_frame, bg=COLORS['card_bg'], relief="solid", bd=1)
+    list_frame.pack(fill="both", expand=True, pady=(0, 15))
+
+    table = ttk.Treeview(list_frame, columns=("date", "event", "added"),
+                         show="headings", selectmode="browse")
+    table.heading("date", text="Date")
+    table.heading("event", text="Event")
+    table.heading("added", text="Added")
+    table.column("date", width=100, anchor="w", stretch=False)
+    table.column("event", width=380, anchor="w")
+    table.column("added", width=70, anchor="center", stretch=False)
+    scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=table.yview)
+
+    # Row ID -> Event of the rows shown, and listing_key() -> row ID
+    listed = {}
+    rows_by_key = {}
+    # Search results being listed (None while every event is), how many
+    # of them are shown, and whether the listing has more to load
+    listing = {"results": None, "position": 0, "more": True}
+    pending_page = [None]
+    placeholder = [None]
+
+    def listing_key(event):
+        if isinstance(event, Occurrence):
+            return ("rule", event.rule.id, event.day)
+        return event.id
+
+    def insert_row(event, index="end"):
+        text = f"↻ {event.text}" if isinstance(event, Occurrence) else event.text
+        row = table.insert("", index, values=(event.date_obj.strftime("%d %b %Y"), text,
+                                              event.created_obj.strftime("%H:%M")))
+        listed[row] = event
+        rows_by_key[listing_key(event)] = row
+
+    def remove_row(row):
+        rows_by_key.pop(listing_key(listed.pop(row)), None)
+        table.delete(row)
+
+    def sync_placeholder():
+        if listed and placeholder[0] is not None:
+            table.delete(placeholder[0])
+            placeholder[0] = None
+        elif not listed and placeholder[0] is None:
+            text = "No events found" if listing["results"] is not None else \
+                "No events yet! Click on dates in the calendar to add events"
+            placeholder[0] = table.insert("", "end", values=("", text, ""))
+
+    def next_page():
+        if listing["results"] is not None:
+            position = listing["position"]
+            listing["position"] += ALL_EVENTS_PAGE_SIZE
+            return listing["results"][position:position + ALL_EVENTS_PAGE_SIZE]
+        # Continue from the date of the last row rather than holding an
+        # iterator, so events added or deleted meanwhile cannot upset it
+        rows = table.get_children()
+        last = listed.get(rows[-1]) if rows else None
+        page = []
+        for event in iter_events(start=None if last is None else last.date):
+            if listing_key(event) not in rows_by_key:
+                page.append(event)
+                if len(page) == ALL_EVENTS_PAGE_SIZE:
+                    break
+        return page
+
+    def load_page():
+        pending_page[0] = None
+        if not win.winfo_exists() or not listing["more"]:
+            return
+        page = next_page()
+        if len(page) < ALL_EVENTS_PAGE_SIZE:
+            listing["more"] = False
+        for event in page:
+            insert_row(event)
+        sync_placeholder()
+
+    def on_table_scrolled(first, last):
+        scrollbar.set(first, last)
+        # Fetch the next page as the end of the loaded rows comes into view
+        if float(last) >= 0.9 and pending_page[0] is None:
+            pending_page[0] = win.after_idle(load_page)
+
+    table.configure(yscrollcommand=on_table_scrolled)
+
+    def show_rows(results=None):
+        """List every event, or the given search results, a page at a time"""
+        table.delete(*table.get_children())
+        listed.clear()
+        rows_by_key.clear()
+        placeholder[0] = None
+        listing.update(results=results, position=0, more=True)
+        load_page()
+        table.yview_moveto(0)
+
+    def insert_in_order(event):
+        """Show an event just added if it falls among the rows loaded so far"""
+        if listing_key(event) in rows_by_key:
+            return
+        key = event.sort_key()
+        rows = table.get_children()
+        for index, row in enumerate(rows):
+            if row in listed and listed[row].sort_key() < key:
+                insert_row(event, index)
+                return
+        if not listing["more"]:
+            insert_row(event)
+
+    def apply_changes(changes):
+        """Update the rows the given store changes touch"""
+        added = []
+        for date_str, event_id, op in changes:
+            if isinstance(event_id, tuple):
+                # A recurring event: drop its rows (on date_str only if
+                # given), or list the occurrences of a new rule
+                rule_id = event_id[1]
+                if op == "delete":
+                    for row, event in list(listed.items()):
+                        if (isinstance(event, Occurrence) and event.rule.id == rule_id
+                                and (date_str is None or event.date == date_str)):
+                            remove_row(row)
+                else:
+                    rule = _rules.find(rule_id)
+                    if rule is not None and listing["results"] is None:
+                        rows = table.get_children()
+                        last = listed.get(rows[-1]) if rows else None
+                        lo = last.day if last is not None and listing["more"] else 1
+                        hi = date.today().toordinal() + RECURRING_LIST_DAYS
+                        added.extend(rule.occurrence(day) for day in rule.occurrences(lo, hi))
+                continue
+            if op in ("delete", "update"):
+                found = [row for row, event in listed.items()
+                         if not isinstance(event, Occurrence) and event.id == event_id]
+                for row in found:
+                    remove_row(row)
+            if op in ("add", "update"):
+                found = _store.find(event_id)
+                if found is not None and found[1].day is not None:
+                    added.append(found[1])
+        if added and listing["results"] is not None:
+            # Whether new text matches the search is the search's business
+            on_search_changed()
+        else:
+            for event in added:
+                insert_in_order(event)
+        sync_placeholder()
 
-        tk.Label(no_events_frame, text="No events yet!",
-                 font=("Segoe UI", 12, "italic"), bg=COLORS['card_bg'],
-                 fg=COLORS['dark_gray']).pack(expand=True, pady=20)
+    def on_events_changed(changes):
+        if not win.winfo_exists():
+            unsubscribe_changes(on_events_changed)
+            return
+        show_stats()
+        if len(changes) > ALL_EVENTS_PAGE_SIZE or RESET in changes:
+            # An import or a reload: listing afresh is cheaper than deltas
+            run_search()
+        else:
+            apply_changes(changes)
 
-        tk.Label(no_events_frame, text="Click on dates in the calendar to add events",
-                 font=("Segoe UI", 9), bg=COLORS['card_bg'],
-                 fg=COLORS['dark_gray']).pack(pady=10)
+    subscribe_changes(on_events_changed)
 
-    def refresh_window():
-        win.destroy()
-        show_all_events_window()
+    def delete_selected(*_):
+        selection = table.selection()
+        if selection and selection[0] in listed:
+            deleted = delete_listed_event(listed[selection[0]], win)
+            if deleted is not None:
+                progress_label.config(text="Event deleted" if deleted else "Failed to delete event!")
+
+    table.bind("<Delete>", delete_selected)
+
+    pending_search = [None]
+
+    def run_search():
+        pending_search[0] = None
+        if not win.winfo_exists():
+            return
+        query = search_var.get().strip()
+        if query:
+            rows = search_events(query)
+            result_count_label.config(text=f"{len(rows)} found")
+            show_rows(rows)
+        else:
+            result_count_label.config(text="")
+            show_rows()
+
+    def on_search_changed(*_):
+        # Wait until typing pauses before searching
+        if pending_search[0] is not None:
+            win.after_cancel(pending_search[0])
+        pending_search[0] = win.after(SEARCH_DEBOUNCE_MS, run_search)
+
+    search_var.trace_add("write", on_search_changed)
+    show_rows()
+
+    table.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+    scrollbar.pack(side="right", fill="y")
+    win.after_idle(show_stats)
 
     # Button frame
     button_frame = tk.Frame(main_frame, bg=COLORS['background'])
     button_frame.pack(fill="x", pady=10)
 
-    refresh_btn = tk.Button(button_frame, text="🔄 Refresh", command=refresh_window,
-                            bg=COLORS['button_hover'], fg="white",
-                            font=("Segoe UI", 10),
-                            bd=0, padx=15, pady=5,
-                            cursor="hand2")
-    refresh_btn.pack(side="left", padx=5)
+    delete_btn = tk.Button(button_frame, text="🗑️ Delete", command=delete_selected,
+                           bg="#fee2e2", fg="#dc2626",
+                           font=("Segoe UI", 10),
+                           bd=0, padx=15, pady=5,
+                           cursor="hand2")
+    delete_btn.pack(side="left", padx=5)
+
+    progress_label = tk.Label(button_frame, text="",
+                              font=("Segoe UI", 9), bg=COLORS['background'],
+                              fg=COLORS['dark_gray'])
+
+    def run_steps(steps, verb, on_done):
+        """Advance an import/export generator one batch per Tk callback"""
+        done = [0]
+
+        def step():
+            if not win.winfo_exists():
+                steps.close()
+                return
+            try:
+                done[0] = next(steps)
+            except StopIteration:
+                on_done(done[0])
+                return
+            except Exception as e:
+                progress_label.config(text="")
+                messagebox.showerror("Error", f"{verb} failed: {str(e)}", parent=win)
+                return
+            progress_label.config(text=f"{verb}: {done[0]} events...")
+            win.after(1, step)
+        progress_label.config(text=f"{verb}...")
+        win.after(1, step)
+
+    def import_ics_file():
+        path = filedialog.askopenfilename(parent=win, title="Import events",
+                                          filetypes=[("iCalendar", "*.ics"), ("All files", "*.*")])
+        if path:
+            run_steps(iter_import_ics(path), "Importing",
+                      lambda count: progress_label.config(
+                          text=f"Imported {count} events (repeats the Repeat menu "
+                               f"cannot express keep their first date only)"))
+
+    def export_ics_file():
+        path = filedialog.asksaveasfilename(parent=win, title="Export events",
+                                            defaultextension=".ics",
+                                            filetypes=[("iCalendar", "*.ics")])
+        if path:
+            run_steps(iter_export_ics(path), "Exporting",
+                      lambda count: progress_label.config(
+                          text=f"Exported {count} events, recurring ones as repeat rules (RRULE)"))
+
+    import_btn = tk.Button(button_frame, text="📥 Import .ics", command=import_ics_file,
+                           bg=COLORS['button_hover'], fg="white",
+                           font=("Segoe UI", 10),
+                           bd=0, padx=15, pady=5,
+                           cursor="hand2")
+    import_btn.pack(side="left", padx=5)
+
+    export_btn = tk.Button(button_frame, text="📤 Export .ics", command=export_ics_file,
+                           bg=COLORS['button_hover'], fg="white",
+                           font=("Segoe UI", 10),
+                           bd=0, padx=15, pady=5,
+                           cursor="hand2")
+    export_btn.pack(side="left", padx=5)
+    progress_label.pack(side="left", padx=5)
 
     close_btn = tk.Button(button_frame, text="Close", command=win.destroy,
                           bg=COLORS['light_gray'], fg=COLORS['text_dark'],
                           font=("Segoe UI", 10),
                           bd=0, padx=20, pady=6,
                           cursor="hand2")
-    close_btn.pack(side="right", padx=5)
-
-
-def delete_event_from_all(date_str, event_text, parent_window):
-    """Delete an event from the all events list"""
-    events = load_events()
-    if date_str in events:
-        for i, event in enumerate(events[date_str]):
-            if event.get('text') == event_text:
-                if delete_event(date_str, i):
-                    messagebox.showinfo("Success", "Event deleted!")
-                    parent_window.destroy()
-                    # Reopen window with updated list
-                    show_all_events_window()
-                    return
-    messagebox.showerror("Error", "Failed to delete event!")
\ No newline at end of file
+    close_btn.pack(side="right", padx=5)
\ No newline at end of file
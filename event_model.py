@@ -0,0 +1,92 @@
+from datetime import date, datetime
+
+# Creation times are stored as seconds since this (naive, local) moment
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def parse_date_key(date_str):
+    """Return the ordinal of a 'YYYY-MM-DD' key, or None if it is not one"""
+    if len(date_str) != 10 or date_str[4] != "-" or date_str[7] != "-":
+        return None
+    try:
+        return date(int(date_str[:4]), int(date_str[5:7]), int(date_str[8:])).toordinal()
+    except ValueError:
+        return None
+
+
+def format_date_key(day):
+    d = date.fromordinal(day)
+    return f"{d.year:04d}-{d.month:02d}-{d.day:02d}"
+
+
+def parse_created_at(created_at):
+    """Return a 'YYYY-MM-DD HH:MM' string as epoch seconds, or None"""
+    day = parse_date_key(created_at[:10])
+    if day is None or len(created_at) != 16 or created_at[10] != " " or created_at[13] != ":":
+        return None
+    try:
+        hour, minute = int(created_at[11:13]), int(created_at[14:])
+    except ValueError:
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return (day - _EPOCH_ORDINAL) * 86400 + hour * 3600 + minute * 60
+
+
+class Event:
+    """One calendar event.
+
+    The date is kept as a day ordinal and the creation time as epoch
+    seconds; the strings and datetimes shown in the UI are only built
+    when asked for. ``day`` is None for events stored under a key that
+    is not a 'YYYY-MM-DD' date, and ``created`` keeps the original
+    string when it could not be parsed, so nothing is lost on save.
+    """
+
+    __slots__ = ("id", "text", "day", "created")
+
+    def __init__(self, id, text, day, created):
+        self.id = id
+        self.text = text
+        self.day = day
+        self.created = created
+
+    @classmethod
+    def from_dict(cls, data, day):
+        created_at = data.get('created_at', "")
+        created = parse_created_at(created_at)
+        return cls(data.get('id', 0), data.get('text', ''), day,
+                   created_at if created is None else created)
+
+    def to_dict(self):
+        return {"id": self.id, "text": self.text, "created_at": self.created_at}
+
+    @property
+    def date(self):
+        return format_date_key(self.day)
+
+    @property
+    def date_obj(self):
+        return datetime.fromordinal(self.day)
+
+    @property
+    def created_obj(self):
+        if isinstance(self.created, str):
+            return datetime.now()
+        days, seconds = divmod(self.created, 86400)
+        return datetime.fromordinal(days + _EPOCH_ORDINAL).replace(
+            hour=seconds // 3600, minute=seconds % 3600 // 60)
+
+    @property
+    def created_at(self):
+        if isinstance(self.created, str):
+            return self.created
+        return self.created_obj.strftime("%Y-%m-%d %H:%M")
+
+    def sort_key(self):
+        """(date, creation time) key; unparsable times sort last"""
+        created = self.created
+        return self.day, (created if not isinstance(created, str) else float("inf"))
+
+    def __repr__(self):
+        return f"Event(id={self.id!r}, text={self.text!r}, day={self.day!r}, created={self.created!r})"
@@ -0,0 +1,654 @@
+import bisect
+import queue
+import threading
+from datetime import datetime
+from event_model import parse_date_key
+from search_index import TextIndex
+from storage import StorageError, apply_op, renumber_duplicate_ids
+
+# Change notification meaning every event may have changed
+RESET = (None, None, "reset")
+
+
+def _sorted_entry(event):
+    # The unique ID breaks ties so two Events are never compared themselves
+    return event.sort_key() + (event.id, event)
+
+
+class EventStore:
+    """In-memory copy of the events that writes through to a backend.
+
+    The backend is only read again when its signature changes, so
+    repeated reads from the UI cost a dictionary lookup. Backends that
+    support it are read one date (or date range) at a time until
+    something needs every event; backends that store events by month
+    are iterated month by month, and those that can read events in order
+    a page at a time.
+
+    With ``background=True`` mutations update memory immediately and are
+    handed to a writer thread, which coalesces whatever is queued into
+    one backend write. Its errors are passed to ``dispatch`` (for Tk,
+    ``root.after``) so ``on_error`` runs on the caller's thread, and so
+    are its change notifications (see subscribe()).
+    """
+
+    def __init__(self, backend, on_error=None, background=False, dispatch=None):
+        self.backend = backend
+        self.on_error = on_error
+        self.background = background
+        self.dispatch = dispatch
+        self._events = {}
+        self._loaded_dates = set()
+        # (start, end) date ranges read with load_range()
+        self._loaded_ranges = []
+        self._complete = False
+        self._signature = None
+        # Event ID -> (date key, Event) of every loaded event
+        self._locations = {}
+        # Old ID -> new ID of added events another process's writes made
+        # the backend renumber, until the cache is next reloaded
+        self._renamed = {}
+        self._next_id = None
+        # Indexes over the cached events, each built on first use
+        self._date_keys = None
+        self._text_index = None
+        self._sorted = None
+        # 'YYYY-MM' -> {day of month: event count}, per month on first use
+        self._day_counts = {}
+        # Held while memory is mutated and while the backend loads; writes
+        # run outside it
+        self._lock = threading.RLock()
+        # Guards _next_id alone, as the backend takes IDs from it while
+        # holding its own lock
+        self._id_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+        # Callbacks given every change, see subscribe()
+        self._listeners = []
+
+    # ==================== LOADING ====================
+
+    def _report(self, message):
+        if self.on_error is not None:
+            self.on_error(message)
+
+    def _call_backend(self, func, *args, default=None):
+        try:
+            return func(*args)
+        except StorageError as e:
+            self._report(str(e))
+        except Exception as e:
+            self._report(f"Failed to load events: {str(e)}")
+        return default
+
+    def refresh(self):
+        """Drop the cache if the data changed since it was last read"""
+        if self._queue.unfinished_tasks:
+            # Memory is ahead of the backend until the writer catches up
+            return
+        signature = self._call_backend(self.backend.signature)
+        if signature is not None and signature == self._signature:
+            return
+        if self._signature is not None:
+            # Someone else changed the stored events
+            self._notify([RESET])
+        self._events = {}
+        self._loaded_dates = set()
+        self._loaded_ranges = []
+        self._complete = False
+        self._signature = signature
+        self._locations = {}
+        self._renamed = {}
+        self._next_id = None
+        self._reset_indexes()
+
+    def _ensure_all(self):
+        self.refresh()
+        if not self._complete:
+            with self._lock:
+                loaded = self._call_backend(self.backend.load, default={})
+                # Dates already in memory may hold writes the backend has
+                # not seen yet; keep them
+                events = {}
+                for date_str, event_list in loaded.items():
+                    if not self._is_loaded(date_str):
+                        events[date_str] = event_list
+                    elif date_str in self._events:
+                        events[date_str] = self._events[date_str]
+                for date_str, event_list in self._events.items():
+                    events.setdefault(date_str, event_list)
+                self._events = events
+                self._complete = True
+                self._locate_all()
+                self._reset_indexes()
+
+    def _is_loaded(self, date_str):
+        return (self._complete or date_str in self._loaded_dates
+                or any(start <= date_str <= end for start, end in self._loaded_ranges))
+
+    def _ensure_date(self, date_str):
+        self.refresh()
+        if self._is_loaded(date_str):
+            return
+        if not self.backend.supports_partial_load:
+            self._ensure_all()
+            return
+        with self._lock:
+            event_list = self._call_backend(self.backend.load_date, date_str, default=[])
+            if event_list:
+                self._events[date_str] = event_list
+                for event in event_list:
+                    # An unsaved event of ours may share the ID until the
+                    # backend renumbers it; keep pointing at ours
+                    self._locations.setdefault(event.id, (date_str, event))
+            self._loaded_dates.add(date_str)
+
+    def _ensure_range(self, start, end):
+        """Load the dates from start to end, keeping dates already in memory
+        (they may hold writes the backend has not seen yet)"""
+        self.refresh()
+        if self._complete or any(lo <= start and end <= hi for lo, hi in self._loaded_ranges):
+            return
+        if not self.backend.supports_partial_load:
+            self._ensure_all()
+            return
+        with self._lock:
+            loaded = self._call_backend(self.backend.load_range, start, end, default=None)
+            if loaded is None:
+                return
+            for date_str, event_list in loaded.items():
+                if not self._is_loaded(date_str):
+                    self._events[date_str] = event_list
+                    for event in event_list:
+                        self._locations.setdefault(event.id, (date_str, event))
+            self._loaded_ranges.append((start, end))
+
+    def _locate_all(self):
+        self._locations = {event.id: (date_str, event)
+                           for date_str, event_list in self._events.items()
+                           for event in event_list}
+
+    # ==================== INDEXES ====================
+
+    def _reset_indexes(self):
+        self._date_keys = None
+        self._text_index = None
+        self._sorted = None
+        self._day_counts = {}
+
+    def _date_index(self):
+        if self._date_keys is None:
+            self._date_keys = sorted(d for d in self.all() if parse_date_key(d) is not None)
+        return self._date_keys
+
+    def _search_index(self):
+        if self._text_index is None:
+            index = TextIndex()
+            for date_str, event_list in self.all().items():
+                for event in event_list:
+                    index.add(event.id, event.text, (date_str, event))
+            self._text_index = index
+        return self._text_index
+
+    def _sorted_index(self):
+        """Every dated event as (date, created, tiebreak, Event), ascending"""
+        if self._sorted is None:
+            self._sorted = sorted(_sorted_entry(event)
+                                  for event_list in self.all().values()
+                                  for event in event_list if event.day is not None)
+        return self._sorted
+
+    def _count_event(self, date_str, event, change):
+        counts = self._day_counts.get(date_str[:7])
+        if counts is not None and event.day is not None:
+            day = int(date_str[8:])
+            count = counts.get(day, 0) + change
+            if count > 0:
+                counts[day] = count
+            else:
+                counts.pop(day, None)
+
+    def _sync_date_key(self, date_str):
+        keys = self._date_keys
+        if keys is not None and parse_date_key(date_str) is not None:
+            i = bisect.bisect_left(keys, date_str)
+            indexed = i < len(keys) and keys[i] == date_str
+            if date_str in self._events and not indexed:
+                keys.insert(i, date_str)
+            elif date_str not in self._events and indexed:
+                del keys[i]
+
+    def _index_event(self, date_str, event):
+        """Add an event that was just stored under date_str to the indexes"""
+        self._locations[event.id] = (date_str, event)
+        self._sync_date_key(date_str)
+        self._count_event(date_str, event, 1)
+        if self._text_index is not None:
+            self._text_index.add(event.id, event.text, (date_str, event))
+        if self._sorted is not None and event.day is not None:
+            bisect.insort(self._sorted, _sorted_entry(event))
+
+    def _unindex_event(self, date_str, event):
+        """Drop an event from the indexes before it is removed or changed"""
+        self._locations.pop(event.id, None)
+        self._count_event(date_str, event, -1)
+        if self._text_index is not None:
+            self._text_index.remove(event.id, event.text)
+        if self._sorted is not None and event.day is not None:
+            i = bisect.bisect_left(self._sorted, _sorted_entry(event))
+            if i < len(self._sorted) and self._sorted[i][-1] is event:
+                del self._sorted[i]
+
+    # ==================== QUERIES ====================
+
+    def all(self):
+        """Return the cached {date: [Event, ...]} mapping (do not modify)"""
+        self._ensure_all()
+        return self._events
+
+    def events_for_date(self, date_str):
+        self._ensure_date(date_str)
+        return self._events.get(date_str, [])
+
+    def find(self, event_id):
+        """Return (date, Event) for an event ID, or None"""
+        found = self._locations.get(self._renamed.get(event_id, event_id))
+        if found is None and not self._complete:
+            self._ensure_all()
+            found = self._locations.get(self._renamed.get(event_id, event_id))
+        return found
+
+    def events_in_range(self, start, end):
+        """Return {date: [Event, ...]} for dates from start to end inclusive"""
+        if self.backend.supports_partial_load and not self._complete:
+            self._ensure_range(start, end)
+            if not self._complete:
+                return {date_str: self._events[date_str]
+                        for date_str in sorted(self._events)
+                        if start <= date_str <= end and parse_date_key(date_str) is not None}
+        keys = self._date_index()
+        lo = bisect.bisect_left(keys, start)
+        hi = bisect.bisect_right(keys, end)
+        return {date_str: self._events[date_str] for date_str in keys[lo:hi]}
+
+    def day_counts(self, year, month):
+        """Return {day of month: number of events} for one month (do not
+        modify). Counted once, then kept up to date by every mutation."""
+        self.refresh()
+        month_key = f"{year:04d}-{month:02d}"
+        counts = self._day_counts.get(month_key)
+        if counts is None:
+            events = self.events_in_range(month_key + "-01", month_key + "-31")
+            counts = {int(date_str[8:]): len(event_list)
+                      for date_str, event_list in events.items() if event_list}
+            self._day_counts[month_key] = counts
+        return counts
+
+    def iter_events(self, reverse=True, start=None, limit=None, snapshot=False):
+        """Yield dated Events in (date, created) order without copying them.
+
+        ``start`` is a 'YYYY-MM-DD' key: iteration begins at the last
+        event on or before it (reverse) or the first on or after it.
+        Stops after ``limit`` events. Do not mutate the store while a
+        generator is being consumed, unless ``snapshot`` is set: then the
+        order is copied when called (not the events), for a consumer that
+        runs across UI callbacks.
+        """
+        if start is not None and parse_date_key(start) is None:
+            raise ValueError(f"Invalid date: {start}")
+        self.refresh()
+        if not self._complete:
+            months = self._call_backend(self.backend.months)
+            if months is not None:
+                # Each month is sorted into a list of its own already
+                return self._iter_by_month(months, reverse, start, limit)
+            if self.backend.supports_sorted_iteration and not self._queue.unfinished_tasks:
+                # Nothing in memory the backend has not seen
+                return self._iter_stored(reverse, start, limit)
+        entries = self._sorted_index()
+        return self._iter_sorted(list(entries) if snapshot else entries, reverse, start, limit)
+
+    def _iter_by_month(self, months, reverse, start, limit):
+        """iter_events() that loads one month at a time"""
+        # Months only in memory have writes the backend has not seen yet
+        months = set(months)
+        months.update(date_str[:7] for date_str in self._events
+                      if parse_date_key(date_str) is not None)
+        start_day = None if start is None else parse_date_key(start)
+        yielded = 0
+        for month in sorted(months, reverse=reverse):
+            if start is not None and (month > start[:7] if reverse else month < start[:7]):
+                continue
+            entries = sorted((_sorted_entry(event)
+                              for event_list in self.events_in_range(month + "-01", month + "-31").values()
+                              for event in event_list), reverse=reverse)
+            for entry in entries:
+                if start_day is not None and (entry[0] > start_day if reverse else entry[0] < start_day):
+                    continue
+                if limit is not None and yielded >= limit:
+                    return
+                yield entry[-1]
+                yielded += 1
+
+    def _iter_stored(self, reverse, start, limit):
+        """iter_events() read in order from the backend"""
+        try:
+            yield from self.backend.iter_sorted(reverse, start, limit)
+        except Exception as e:
+            self._report(f"Failed to load events: {str(e)}")
+
+    def _iter_sorted(self, entries, reverse, start, limit):
+        if start is None:
+            i = len(entries) - 1 if reverse else 0
+        else:
+            day = parse_date_key(start)
+            if reverse:
+                i = bisect.bisect_left(entries, (day + 1,)) - 1
+            else:
+                i = bisect.bisect_left(entries, (day,))
+        step = -1 if reverse else 1
+        yielded = 0
+        while 0 <= i < len(entries) and (limit is None or yielded < limit):
+            yield entries[i][-1]
+            i += step
+            yielded += 1
+
+    def search(self, query):
+        """Return [(date, event), ...] whose text has a word starting with
+        each word of the query"""
+        return self._search_index().search(query)
+
+    def event_count(self):
+        return sum(len(event_list) for event_list in self.all().values())
+
+    def date_count(self):
+        return len(self.all())
+
+    # ==================== CHANGE NOTIFICATIONS ====================
+
+    def subscribe(self, callback):
+        """Call callback(changes) whenever events change.
+
+        ``changes`` is a list of (date, event ID, op) tuples, op being
+        "add", "update" or "delete"; an event moved to another date is a
+        delete and an add. RESET means anything may have changed (the
+        events were replaced or changed by another process). Changes the
+        writer thread finds are delivered through ``dispatch``.
+        """
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, changes):
+        if not self._listeners or not changes:
+            return
+        if self.dispatch is not None and threading.current_thread() is self._writer:
+            try:
+                self.dispatch(lambda: self._deliver(changes))
+            except Exception:
+                # The UI is already gone (e.g. while closing)
+                pass
+            return
+        self._deliver(changes)
+
+    def _deliver(self, changes):
+        for callback in list(self._listeners):
+            callback(changes)
+
+    # ==================== MUTATIONS ====================
+
+    def _events_to_write(self, items):
+        """Copy of the events for a write of items, taken under the lock
+        together with the items so it holds exactly their changes; None
+        when only some dates are loaded"""
+        if any(kind == "save" for kind, _, _ in items) or self._complete:
+            return {date_str: list(event_list) for date_str, event_list in self._events.items()}
+        return None
+
+    def _write(self, items, events, report):
+        """Hand queued ("commit", op, added Event or None) / ("save", None,
+        None) items and _events_to_write() to the backend.
+
+        The lock is not held meanwhile, only while applying the result, so
+        the UI thread can keep changing events while the backend works
+        (which may mean waiting for another process's lock).
+        """
+        save = any(kind == "save" for kind, _, _ in items)
+        try:
+            if save:
+                # A full save already contains every queued op
+                self.backend.save(events)
+                remap = None
+            else:
+                remap = self.backend.commit_many([op for _, op, _ in items], events,
+                                                 reserve=self._reserve_ids)
+            signature = self.backend.signature() if remap is None else None
+        except Exception as e:
+            report(f"Failed to save events: {str(e)}")
+            with self._lock:
+                # Force a reload next time so memory matches what is stored
+                self._signature = None
+            self._notify([RESET])
+            return False
+        with self._lock:
+            if remap is None:
+                self._signature = signature
+                return True
+            # Another process wrote in between: take over the IDs the
+            # backend gave our new events and reload once the queue is done
+            self._apply_remap(remap, {op['event']['id']: event for _, op, event in items
+                                      if event is not None})
+            self._reset_indexes()
+            self._signature = None
+        self._notify([RESET])
+        return True
+
+    def _apply_remap(self, remap, added):
+        """Rename the written events in ``added`` ({old ID: Event}) as the
+        backend did, along with the ops queued for them meanwhile"""
+        with self._queue.mutex:
+            queued = self._queue.queue
+            for i, item in enumerate(queued):
+                if item is not None and item[0] == "commit" and item[1].get('id') in remap:
+                    kind, op, event = item
+                    queued[i] = (kind, dict(op, id=remap[op['id']]), event)
+        for old_id, new_id in remap.items():
+            event = added.get(old_id)
+            if event is not None:
+                self._move_id(event, new_id)
+                self._renamed[old_id] = new_id
+
+    def _reserve_ids(self, count, start):
+        """Called by the backend, which holds its own lock, to take count
+        IDs from at least start for events it renumbers, past any this
+        store has handed out while the write was running"""
+        with self._id_lock:
+            start = max(start, self._next_id or 1)
+            self._next_id = start + count
+            return start
+
+    def _move_id(self, event, new_id):
+        found = self._locations.get(event.id)
+        if found is not None and found[1] is event:
+            del self._locations[event.id]
+            self._locations[new_id] = found
+        event.id = new_id
+
+    def _persist(self, *items):
+        if not self.background:
+            return self._write(list(items), self._events_to_write(items), self._report)
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer,
+                                            name="EventStoreWriter", daemon=True)
+            self._writer.start()
+        for item in items:
+            self._queue.put(item)
+        return True
+
+    def _report_from_writer(self, message):
+        if self.dispatch is None:
+            self._report(message)
+            return
+        try:
+            self.dispatch(lambda: self._report(message))
+        except Exception:
+            # The UI is already gone (e.g. while closing)
+            self._report(message)
+
+    def _run_writer(self):
+        while True:
+            items = [self._queue.get()]
+            # Drained under the lock, so the events copied for the write
+            # hold exactly the changes of the drained items
+            with self._lock:
+                while True:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                pending = [item for item in items if item is not None]
+                events = self._events_to_write(pending) if pending else None
+            if pending:
+                self._write(pending, events, self._report_from_writer)
+            for _ in items:
+                self._queue.task_done()
+            if len(pending) < len(items):
+                return
+
+    def flush(self):
+        """Block until every queued write has reached the backend"""
+        self._queue.join()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def _commit(self, op):
+        with self._lock:
+            if op['op'] != "add":
+                found = self.find(op['id'])
+                if found is None:
+                    return False
+                self._unindex_event(*found)
+            event = apply_op(self._events, op)
+            self._sync_date_key(op['date'])
+            if op['op'] != "delete":
+                self._index_event(op.get('new_date', op['date']), event)
+            saved = self._persist(("commit", op, event if op['op'] == "add" else None))
+        date_str = op['date']
+        if op['op'] == "add":
+            self._notify([(date_str, op['event']['id'], "add")])
+        elif op['op'] == "delete":
+            self._notify([(date_str, op['id'], "delete")])
+        elif op.get('new_date', date_str) != date_str:
+            self._notify([(date_str, op['id'], "delete"), (op['new_date'], op['id'], "add")])
+        else:
+            self._notify([(date_str, op['id'], "update")])
+        return saved
+
+    def _allocate_id(self):
+        next_id = None
+        if self._next_id is None:
+            next_id = self._call_backend(self.backend.next_id, default=1)
+            if self._locations:
+                next_id = max(next_id, max(self._locations) + 1)
+        with self._id_lock:
+            event_id = max(self._next_id or 1, next_id or 1)
+            self._next_id = event_id + 1
+        return event_id
+
+    def replace(self, events):
+        """Replace every event and save the result"""
+        self._ensure_all()
+        with self._lock:
+            next_id = renumber_duplicate_ids(events)
+            self._events = events
+            self._locate_all()
+            with self._id_lock:
+                self._next_id = max(self._next_id or 1, next_id or 1,
+                                    max(self._locations, default=0) + 1)
+            self._reset_indexes()
+            saved = self._persist(("save", None, None))
+        self._notify([RESET])
+        return saved
+
+    def add(self, date_str, text):
+        """Add an event and return its ID (None if it could not be saved)"""
+        self._ensure_date(date_str)
+        with self._lock:
+            event_id = self._allocate_id()
+            saved = self._commit({
+                "op": "add",
+                "date": date_str,
+                "event": {
+                    "id": event_id,
+                    "text": text,
+                    "created_at": datetime.now().strftime("%Y-%m-%d %H:%M")
+                }
+            })
+        return self._renamed.get(event_id, event_id) if saved else None
+
+    def add_many(self, entries):
+        """Add (date, text, created_at or None) entries with one backend
+        write and return how many were saved"""
+        self._ensure_all()
+        items = []
+        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self._lock:
+            for date_str, text, created_at in entries:
+                op = {
+                    "op": "add",
+                    "date": date_str,
+                    "event": {"id": self._allocate_id(), "text": text,
+                              "created_at": created_at or now}
+                }
+                event = apply_op(self._events, op)
+                self._locations[event.id] = (date_str, event)
+                items.append(("commit", op, event))
+            if not items:
+                return 0
+            # Cheaper to rebuild on next use than to insort a whole batch
+            self._reset_indexes()
+            saved = self._persist(*items)
+        self._notify([(op['date'], op['event']['id'], "add") for _, op, _ in items])
+        return len(items) if saved else 0
+
+    def delete_by_id(self, event_id):
+        # Locked so the writer cannot renumber the event before the commit
+        with self._lock:
+            found = self.find(event_id)
+            if found is None:
+                return False
+            return self._commit({"op": "delete", "date": found[0], "id": found[1].id})
+
+    def update_by_id(self, event_id, text=None, date_str=None):
+        """Change the text and/or move an event to another date"""
+        with self._lock:
+            found = self.find(event_id)
+            if found is not None and date_str is not None:
+                events = self._events
+                self._ensure_date(date_str)
+                if self._events is not events:
+                    # Loading the target date reloaded a stale cache, which
+                    # forgets renumbered IDs: look up the current one again
+                    found = self.find(found[1].id)
+            if found is None:
+                return False
+            op = {"op": "update", "date": found[0], "id": found[1].id}
+            if text is not None:
+                op['text'] = text
+            if date_str is not None and date_str != found[0]:
+                op['new_date'] = date_str
+            return self._commit(op)
+
+    def delete(self, date_str, event_index):
+        event_list = self.events_for_date(date_str)
+        if not 0 <= event_index < len(event_list):
+            return False
+        return self.delete_by_id(event_list[event_index].id)
@@ -1,16 +1,20 @@
 import tkinter as tk
 from datetime import datetime
 from tkinter import ttk
-from calendar_view import show_calendar, prev_month, next_month, prev_year, next_year
+from calendar_view import MonthGrid, prev_month, next_month, prev_year, next_year
 from ui_components import create_sidebar
+from event_manager import close_event_store, subscribe_changes, unsubscribe_changes
 from styles import COLORS
 from calculators import (
     weekday_function, add_days_function, subtract_days_function,
-    duration_function
+    duration_function, working_days_function, add_business_days_function
 )
 
 current_year = datetime.now().year
 current_month = datetime.now().month
+# Quiet time after the last navigation before neighbouring months are
+# prefetched, so holding an arrow key is not slowed down by it
+PREFETCH_DELAY_MS = 150
 
 
 def create_card(parent, title="", bg=COLORS['light_gray']):
@@ -70,10 +74,43 @@ def create_nav_button(parent, text, command):
                      activebackground=COLORS['button_hover'])
 
 
-def main():
+class ViewManager:
+    """Shows one of several views in a container.
+
+    A view is built by its registered builder the first time it is shown,
+    into its own frame stacked over the others; switching views just
+    raises a frame, so widgets and whatever the user typed are kept. A
+    builder may return a refresh() function, called whenever its view is
+    shown again, to update data that changed meanwhile.
+    """
+
+    def __init__(self, container):
+        self.container = container
+        self.current = None
+        self._builders = {}
+        self._frames = {}
+        self._refreshers = {}
+
+    def register(self, name, build):
+        self._builders[name] = build
+
+    def show(self, name):
+        frame = self._frames.get(name)
+        if frame is None:
+            frame = tk.Frame(self.container, bg=COLORS['background'])
+            frame.place(relx=0, rely=0, relwidth=1, relheight=1)
+            self._frames[name] = frame
+            self._refreshers[name] = self._builders[name](frame)
+        elif self._refreshers[name] is not None:
+            self._refreshers[name]()
+        frame.tkraise()
+        self.current = name
+
+
+def create_app(root):
+    """Build the main window's widgets in root and return its ViewManager"""
     global current_year, current_month
 
-    root = tk.Tk()
     root.title("CalendarApp")
     root.geometry("800x600")
     root.configure(bg=COLORS['background'])
@@ -93,12 +130,9 @@ def main():
     widgets = {}
 
     # ==================== CALENDAR UI WITH COMPACT LAYOUT ====================
-    def create_calendar_ui():
-        for widget in content_frame.winfo_children():
-            widget.destroy()
-
+    def create_calendar_ui(parent):
         # Main frame for calendar - COMPACT
-        main_cal_frame = tk.Frame(content_frame, bg=COLORS['calendar_bg'])
+        main_cal_frame = tk.Frame(parent, bg=COLORS['calendar_bg'])
         main_cal_frame.pack(fill="both", expand=True, padx=2, pady=2)
 
         # Frame for top navigation - VERY COMPACT
@@ -173,29 +207,59 @@ def main():
                            show="headings",
                            style="Compact.Treeview")
 
-        # Set column widths
-        for i in range(7):
-            cal.heading(str(i), text="")
-            cal.column(str(i), width=78, anchor="center", stretch=False)
+        # Headings, columns, week rows and the click handler are set up once
+        grid = MonthGrid(cal, header)
 
         # PACK without expand to not fill empty space
         cal.pack(fill="both", padx=0, pady=0)
+        calendar_container.pack_propagate(False)
+        shown_rows = [0]
+        # Pending after_idle render and after prefetch callbacks
+        pending_render = [None]
+        pending_prefetch = [None]
 
         def update_calendar():
-            """Update calendar with current month and year"""
-            show_calendar(current_year, current_month, cal, header)
-
-            # Force compact layout
-            calendar_container.update_idletasks()
-
-            # Set exact needed height
-            num_rows = len(cal.get_children())
-            if num_rows > 0:
-                # Total height = (num_rows * rowheight) + padding
-                total_height = (num_rows * 28) + 5  # 28 = rowheight, 5 = padding
-                cal.configure(height=num_rows)
-                calendar_container.config(height=total_height)
-                calendar_container.pack_propagate(False)
+            """Show the current month once Tk is idle. Requests made before
+            then (e.g. key auto-repeat) share one render of the latest month."""
+            if pending_render[0] is None:
+                pending_render[0] = root.after_idle(render_calendar)
+
+        def render_calendar():
+            pending_render[0] = None
+            if not cal.winfo_exists():
+                return
+            grid.show(current_year, current_month)
+
+            # Set exact needed height when the number of weeks changes
+            if grid.weeks != shown_rows[0]:
+                shown_rows[0] = grid.weeks
+                # Total height = (weeks * rowheight) + padding
+                calendar_container.config(height=(grid.weeks * 28) + 5)  # 28 = rowheight, 5 = padding
+
+            if pending_prefetch[0] is not None:
+                root.after_cancel(pending_prefetch[0])
+            neighbours = [step(current_year, current_month)
+                          for step in (next_month, prev_month, next_year, prev_year)]
+            pending_prefetch[0] = root.after(PREFETCH_DELAY_MS, prefetch_next, neighbours)
+
+        def prefetch_next(months):
+            """Prefetch one month per idle callback, so input is handled
+            in between"""
+            pending_prefetch[0] = None
+            if not months or not cal.winfo_exists():
+                return
+            grid.prefetch(*months[0])
+            pending_prefetch[0] = root.after_idle(prefetch_next, months[1:])
+
+        def on_events_changed(changes):
+            # Counts are kept per day by the store, so a re-render only
+            # rewrites the weeks whose badges changed
+            month = f"{current_year:04d}-{current_month:02d}"
+            if any(date_str is None or date_str.startswith(month) for date_str, _, _ in changes):
+                update_calendar()
+
+        subscribe_changes(on_events_changed)
+        cal.bind("<Destroy>", lambda e: unsubscribe_changes(on_events_changed))
 
         # Initialize calendar
         update_calendar()
@@ -203,15 +267,15 @@ def main():
         widgets['main'] = {
             'header': header,
             'calendar': cal,
+            'grid': grid,
             'update_func': update_calendar
         }
+        # Events may have changed while another view was shown
+        return update_calendar
 
     # ==================== WEEKDAY UI ====================
-    def create_weekday_ui():
-        for widget in content_frame.winfo_children():
-            widget.destroy()
-
-        main_card = create_card(content_frame, bg=COLORS['light_gray'])
+    def create_weekday_ui(parent):
+        main_card = create_card(parent, bg=COLORS['light_gray'])
         main_card.pack(fill="both", expand=True, padx=4, pady=4)
 
         tk.Label(main_card, text="Weekday Calculator",
@@ -259,11 +323,8 @@ def main():
         }
 
     # ==================== ADD DAYS UI ====================
-    def create_add_days_ui():
-        for widget in content_frame.winfo_children():
-            widget.destroy()
-
-        main_card = create_card(content_frame, bg=COLORS['light_gray'])
+    def create_add_days_ui(parent):
+        main_card = create_card(parent, bg=COLORS['light_gray'])
         main_card.pack(fill="both", expand=True, padx=4, pady=4)
 
         tk.Label(main_card, text="Add Days Calculator",
@@ -323,11 +384,8 @@ def main():
         }
 
     # ==================== SUBTRACT DAYS UI ====================
-    def create_subtract_days_ui():
-        for widget in content_frame.winfo_children():
-            widget.destroy()
-
-        main_card = create_card(content_frame, bg=COLORS['light_gray'])
+    def create_subtract_days_ui(parent):
+        main_card = create_card(parent, bg=COLORS['light_gray'])
         main_card.pack(fill="both", expand=True, padx=4, pady=4)
 
         tk.Label(main_card, text="Subtract Days Calculator",
@@ -387,11 +445,8 @@ def main():
         }
 
     # ==================== DURATION UI ====================
-    def create_duration_ui():
-        for widget in content_frame.winfo_children():
-            widget.destroy()
-
-        main_card = create_card(content_frame, bg=COLORS['light_gray'])
+    def create_duration_ui(parent):
+        main_card = create_card(parent, bg=COLORS['light_gray'])
         main_card.pack(fill="both", expand=True, padx=4, pady=4)
 
         tk.Label(main_card, text="Duration Calculator",
@@ -461,18 +516,111 @@ def main():
             'result_label': result_label
         }
 
+    # ==================== BUSINESS DAYS UI ====================
+    def create_business_days_ui(parent):
+        main_card = create_card(parent, bg=COLORS['light_gray'])
+        main_card.pack(fill="both", expand=True, padx=4, pady=4)
+
+        tk.Label(main_card, text="Business Days Calculator",
+                 font=("Segoe UI", 16, "bold"), bg=COLORS['light_gray'],
+                 fg=COLORS['text_dark']).pack(pady=(12, 12))
+
+        card1 = create_card(main_card, "Start Date", bg=COLORS['light_gray'])
+        card1.pack(pady=6, padx=35, fill="x")
+
+        inputs_frame1 = tk.Frame(card1, bg=COLORS['light_gray'])
+        inputs_frame1.pack(pady=4)
+
+        day_spin1, day_frame1 = create_input_group(inputs_frame1, "Day", (1, 31), datetime.now().day)
+        day_frame1.grid(row=0, column=0, padx=8, pady=4)
+
+        month_spin1, month_frame1 = create_input_group(inputs_frame1, "Month", (1, 12), datetime.now().month)
+        month_frame1.grid(row=0, column=1, padx=8, pady=4)
+
+        year_spin1, year_frame1 = create_input_group(inputs_frame1, "Year", (1900, 2100), datetime.now().year)
+        year_frame1.grid(row=0, column=2, padx=8, pady=4)
+
+        card2 = create_card(main_card, "End Date", bg=COLORS['light_gray'])
+        card2.pack(pady=6, padx=35, fill="x")
+
+        inputs_frame2 = tk.Frame(card2, bg=COLORS['light_gray'])
+        inputs_frame2.pack(pady=4)
+
+        day_spin2, day_frame2 = create_input_group(inputs_frame2, "Day", (1, 31), "31")
+        day_frame2.grid(row=0, column=0, padx=8, pady=4)
+
+        month_spin2, month_frame2 = create_input_group(inputs_frame2, "Month", (1, 12), "12")
+        month_frame2.grid(row=0, column=1, padx=8, pady=4)
+
+        year_spin2, year_frame2 = create_input_group(inputs_frame2, "Year", (1900, 2100), datetime.now().year)
+        year_frame2.grid(row=0, column=2, padx=8, pady=4)
+
+        button_frame = tk.Frame(main_card, bg=COLORS['light_gray'])
+        button_frame.pack(pady=6)
+
+        count_btn = create_blue_button(button_frame, "Count Business Days",
+                                       command=lambda: working_days_function('business',
+                                                                             {'business': day_spin1},
+                                                                             {'business': month_spin1},
+                                                                             {'business': year_spin1},
+                                                                             {'business': day_spin2},
+                                                                             {'business': month_spin2},
+                                                                             {'business': year_spin2},
+                                                                             result_label))
+        count_btn.pack()
+
+        # Business days are added to the start date, or subtracted when negative
+        add_card = create_card(main_card, "Business Days to Add", bg=COLORS['light_gray'])
+        add_card.pack(pady=6, padx=35, fill="x")
+
+        add_frame = tk.Frame(add_card, bg=COLORS['light_gray'])
+        add_frame.pack(pady=6)
+
+        days_entry = tk.Entry(add_frame, width=15, font=("Segoe UI", 10),
+                              bg=COLORS['input_bg'], bd=1, relief="solid")
+        days_entry.insert(0, "10")
+        days_entry.pack(side="left", padx=10)
+
+        add_btn = create_blue_button(add_frame, "Add Business Days",
+                                     command=lambda: add_business_days_function('business',
+                                                                                {'business': day_spin1},
+                                                                                {'business': month_spin1},
+                                                                                {'business': year_spin1},
+                                                                                {'business': days_entry},
+                                                                                result_label))
+        add_btn.pack(side="left", padx=10)
+
+        result_card = create_card(main_card, bg=COLORS['light_gray'])
+        result_card.pack(fill="x", padx=35, pady=6)
+
+        result_label = tk.Label(result_card, text="",
+                                font=("Segoe UI", 10), bg=COLORS['light_gray'],
+                                wraplength=400, justify="left",
+                                fg=COLORS['text_dark'])
+        result_label.pack(pady=8, padx=8)
+
+        widgets['business'] = {
+            'day_spin1': day_spin1,
+            'month_spin1': month_spin1,
+            'year_spin1': year_spin1,
+            'day_spin2': day_spin2,
+            'month_spin2': month_spin2,
+            'year_spin2': year_spin2,
+            'days_entry': days_entry,
+            'result_label': result_label
+        }
+
     # ==================== MAIN NAVIGATION FUNCTION ====================
+    views = ViewManager(content_frame)
+    views.register("main", create_calendar_ui)
+    views.register("weekday", create_weekday_ui)
+    views.register("add", create_add_days_ui)
+    views.register("subtract", create_subtract_days_ui)
+    views.register("count", create_duration_ui)
+    views.register("business", create_business_days_ui)
+
     def show_frame(frame_name):
-        if frame_name == "main":
-            create_calendar_ui()
-        elif frame_name == "weekday":
-            create_weekday_ui()
-        elif frame_name == "add":
-            create_add_days_ui()
-        elif frame_name == "subtract":
-            create_subtract_days_ui()
-        elif frame_name == "count":
-            create_duration_ui()
+        views.show(frame_name)
 
     # ==================== SIDEBAR ====================
     sidebar_container = tk.Frame(main_container, bg=COLORS['sidebar'], width=180)
@@ -482,11 +630,11 @@ def main():
     create_sidebar(sidebar_container, show_frame)
 
     # Initialize with calendar
-    create_calendar_ui()
+    views.show("main")
 
     # ==================== KEYBOARD NAVIGATION ====================
     def handle_key(event):
-        if 'main' in widgets and widgets['main']:
+        if views.current == "main":
             global current_year, current_month
             if event.keysym == "Left":
                 current_year, current_month = prev_month(current_year, current_month)
@@ -509,4 +657,13 @@ def main():
     # Bind Escape to quit
     root.bind("<Escape>", lambda e: root.quit())
 
-    root.mainloop()
\ No newline at end of file
+    return views
+
+
+def main():
+    root = tk.Tk()
+    create_app(root)
+    root.mainloop()
+
+    # Make sure queued event writes reach the disk before exiting
+    close_event_store()
\ No newline at end of file
@@ -0,0 +1,292 @@
+import itertools
+import re
+from datetime import date, datetime
+
+_ESCAPES = {"\\\\": "\\", "\\n": "\n", "\\N": "\n", "\\,": ",", "\\;": ";"}
+_ESCAPE_RE = re.compile(r"\\[\\nN,;]")
+# RRULE weekday codes, Monday = 0
+_WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+
+# iCalendar (RFC 5545) is read and written with generators so files of
+# any size are processed one line / one VEVENT at a time.
+
+# ==================== READING ====================
+
+def unfold_lines(f):
+    """Yield logical lines, joining folded continuation lines"""
+    pending = None
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending:
+        yield pending
+
+
+def parse_vevents(lines):
+    """Yield each VEVENT as {NAME: (params, value)}"""
+    props = None
+    for line in lines:
+        name, _, value = line.partition(":")
+        name, *params = name.split(";")
+        name = name.upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            props = {}
+        elif name == "END" and value.upper() == "VEVENT":
+            if props is not None:
+                yield props
+            props = None
+        elif props is not None and name not in props:
+            props[name] = (params, value)
+        elif props is not None and name == "EXDATE":
+            # Skipped dates may be spread over several lines
+            props[name] = (props[name][0], f"{props[name][1]},{value}")
+
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES[m.group()], text)
+
+
+def _parse_stamp(value):
+    """Return (date, datetime or None) for a DATE or DATE-TIME value"""
+    value = value.strip()
+    day = date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    if len(value) >= 13 and value[8] == "T":
+        return day, datetime(day.year, day.month, day.day, int(value[9:11]), int(value[11:13]))
+    return day, None
+
+
+def _date_key(day):
+    return f"{day.year:04d}-{day.month:02d}-{day.day:02d}"
+
+
+def vevent_to_event(props):
+    """Return (date key, text, created_at) for a VEVENT, or None to skip it"""
+    if "DTSTART" not in props:
+        return None
+    try:
+        day, _ = _parse_stamp(props["DTSTART"][1])
+    except (ValueError, IndexError):
+        return None
+    text = _unescape(props.get("SUMMARY", ([], ""))[1]).strip()
+    if not text:
+        return None
+    created_at = None
+    for name in ("CREATED", "DTSTAMP"):
+        if name in props:
+            try:
+                stamp = _parse_stamp(props[name][1])[1]
+            except (ValueError, IndexError):
+                continue
+            if stamp is not None:
+                created_at = stamp.strftime("%Y-%m-%d %H:%M")
+                break
+    return _date_key(day), text, created_at
+
+
+def _parse_rrule(value):
+    """Return (freq, interval, byweekday, until, count) for an RRULE the
+    recurrence module can follow, else None"""
+    parts = {}
+    for part in value.split(";"):
+        name, _, part_value = part.partition("=")
+        parts[name.strip().upper()] = part_value.strip().upper()
+    freq = parts.pop("FREQ", "").lower()
+    if freq not in ("daily", "weekly", "monthly", "yearly"):
+        return None
+    try:
+        interval = int(parts.pop("INTERVAL", "1"))
+        count = int(parts.pop("COUNT")) if "COUNT" in parts else None
+        until = _parse_stamp(parts.pop("UNTIL"))[0] if "UNTIL" in parts else None
+        # Codes with a position such as 1MO (first Monday) are not followed
+        byweekday = ([_WEEKDAY_CODES.index(code.strip()) for code in parts.pop("BYDAY").split(",")]
+                     if "BYDAY" in parts else None)
+    except (ValueError, IndexError):
+        return None
+    # Weeks start on Monday; another start only matters every other week or more
+    week_start = parts.pop("WKST", "MO")
+    if parts or interval < 1 or (count is not None and count < 1) \
+            or (week_start != "MO" and freq == "weekly" and interval > 1):
+        return None
+    return freq, interval, byweekday, until, count
+
+
+def vevent_to_rule(props, event):
+    """Return a VEVENT with an RRULE as a rule file dict without an ``id``
+    (``event`` is its vevent_to_event result), or None if it has no RRULE
+    or one the recurrence module cannot follow"""
+    if "RRULE" not in props:
+        return None
+    repeat = _parse_rrule(props["RRULE"][1])
+    if repeat is None:
+        return None
+    date_key, text, created_at = event
+    freq, interval, byweekday, until, count = repeat
+    exceptions = set()
+    for value in props.get("EXDATE", ([], ""))[1].split(","):
+        try:
+            exceptions.add(_date_key(_parse_stamp(value)[0]))
+        except (ValueError, IndexError):
+            continue
+    return {"text": text, "start": date_key, "freq": freq, "interval": interval,
+            "byweekday": byweekday, "until": None if until is None else _date_key(until),
+            "count": count, "exceptions": sorted(exceptions), "created_at": created_at}
+
+
+def read_events(f):
+    """Yield (date key, text, created_at, rule) for every usable VEVENT in
+    f; ``rule`` is its vevent_to_rule result"""
+    for props in parse_vevents(unfold_lines(f)):
+        event = vevent_to_event(props)
+        if event is not None:
+            yield (*event, vevent_to_rule(props, event))
+
+
+# ==================== WRITING ====================
+
+def _escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def fold_line(line):
+    """Split a content line into 75-octet pieces joined by CRLF + space"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    pieces = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(pieces) + "\r\n"
+
+
+def _format_stamp(value, with_time):
+    text = f"{value.year:04d}{value.month:02d}{value.day:02d}"
+    if with_time:
+        text += f"T{value.hour:02d}{value.minute:02d}00"
+    return text
+
+
+CALENDAR_HEADER = "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//CalendarApp//EN\r\n"
+CALENDAR_FOOTER = "END:VCALENDAR\r\n"
+
+
+def format_vevent(event):
+    """Return one Event as VEVENT text"""
+    created = _format_stamp(event.created_obj, True)
+    return (
+        "BEGIN:VEVENT\r\n"
+        f"UID:calendarapp-{event.id}@calendarapp\r\n"
+        f"DTSTAMP:{created}\r\n"
+        f"CREATED:{created}\r\n"
+        f"DTSTART;VALUE=DATE:{_format_stamp(event.date_obj, False)}\r\n"
+        + fold_line(f"SUMMARY:{_escape(event.text)}")
+        + "END:VEVENT\r\n"
+    )
+
+
+def format_rrule(rule):
+    """Return the RRULE line of a recurrence Rule"""
+    parts = [f"FREQ={rule.freq.upper()}"]
+    if rule.interval > 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.byweekday:
+        parts.append("BYDAY=" + ",".join(_WEEKDAY_CODES[wd] for wd in rule.byweekday))
+    # RRULE takes UNTIL or COUNT, not both; the rule's last day covers both
+    if rule.until is not None:
+        parts.append(f"UNTIL={_format_stamp(date.fromordinal(rule.end), False)}")
+    elif rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    return "RRULE:" + ";".join(parts) + "\r\n"
+
+
+def format_rule_vevent(rule):
+    """Return a recurrence Rule as VEVENT text, or None if it never occurs.
+    DTSTART is its first day, which RRULE always counts as an occurrence."""
+    first = rule.first
+    if first is None:
+        return None
+    event = rule.occurrence(first)
+    created = _format_stamp(event.created_obj, True)
+    exceptions = ",".join(_format_stamp(date.fromordinal(day), False)
+                          for day in sorted(rule.exceptions))
+    return (
+        "BEGIN:VEVENT\r\n"
+        f"UID:calendarapp-rule-{rule.id}@calendarapp\r\n"
+        f"DTSTAMP:{created}\r\n"
+        f"CREATED:{created}\r\n"
+        f"DTSTART;VALUE=DATE:{_format_stamp(event.date_obj, False)}\r\n"
+        + format_rrule(rule)
+        + (fold_line(f"EXDATE;VALUE=DATE:{exceptions}") if exceptions else "")
+        + fold_line(f"SUMMARY:{_escape(event.text)}")
+        + "END:VEVENT\r\n"
+    )
+
+
+def write_calendar(events, rules=()):
+    """Yield the text of a VCALENDAR holding the given Events and
+    recurrence Rules"""
+    yield CALENDAR_HEADER
+    for event in events:
+        yield format_vevent(event)
+    for rule in rules:
+        vevent = format_rule_vevent(rule)
+        if vevent is not None:
+            yield vevent
+    yield CALENDAR_FOOTER
+
+
+# ==================== PIPELINES ====================
+
+def iter_import(f, add_batch, batch_size, add_rules=None):
+    """Pass the events of f to add_batch in lists of batch_size, yielding
+    the running total add_batch reports. Events with an RRULE go to
+    add_rules as rule dicts the same way; without add_rules, or when the
+    RRULE cannot be followed, they are imported as their first date."""
+    events = read_events(f)
+    imported = 0
+    while True:
+        batch = list(itertools.islice(events, batch_size))
+        if not batch:
+            return
+        single, rules = [], []
+        for *event, rule in batch:
+            if rule is not None and add_rules is not None:
+                rules.append(rule)
+            else:
+                single.append(tuple(event))
+        if single:
+            imported += add_batch(single)
+        if rules:
+            imported += add_rules(rules)
+        yield imported
+
+
+def iter_export(events, f, batch_size, rules=()):
+    """Write Events, then recurrence Rules, to f as a VCALENDAR, yielding
+    the running count every batch_size events and once at the end"""
+    exported = 0
+    f.write(CALENDAR_HEADER)
+    vevents = itertools.chain(map(format_vevent, events),
+                              filter(None, map(format_rule_vevent, rules)))
+    for vevent in vevents:
+        f.write(vevent)
+        exported += 1
+        if exported % batch_size == 0:
+            yield exported
+    f.write(CALENDAR_FOOTER)
+    yield exported
@@ -0,0 +1,417 @@
+import bisect
+from calendar import monthrange
+from collections import OrderedDict
+from datetime import date, datetime
+from event_model import Event, format_date_key, parse_created_at, parse_date_key
+from storage import StorageError
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+# Last day a rule may produce
+_MAX_DAY = date.max.toordinal()
+# How many ranges counts() remembers (least recently used go first)
+COUNTS_CACHE_SIZE = 24
+
+
+# A recurring event is stored once, as a rule like RFC 5545's RRULE, and
+# its occurrences are computed on demand for the dates being shown.
+# Days are ordinals; date(1, 1, 1) is a Monday, so (day - 1) % 7 is the
+# weekday with Monday = 0.
+
+def weekday(day):
+    return (day - 1) % 7
+
+
+def _month_index(day):
+    d = date.fromordinal(day)
+    return d.year * 12 + d.month - 1
+
+
+def _first_period(start_index, index, interval):
+    """First period at or after index that is interval periods apart
+    from start_index"""
+    if index <= start_index:
+        return start_index
+    return start_index + -(-(index - start_index) // interval) * interval
+
+
+def _weekdays_between(lo, hi, weekdays):
+    """Every day from lo to hi whose weekday is in weekdays, ascending"""
+    days = []
+    for wd in weekdays:
+        days.extend(range(lo + (wd - weekday(lo)) % 7, hi + 1, 7))
+    days.sort()
+    return days
+
+
+# ==================== RULES ====================
+
+class Rule:
+    """One recurring event.
+
+    ``start`` is the first day it may occur, ``byweekday`` the weekdays
+    (Monday = 0) it occurs on, ``until`` the last day and ``count`` the
+    number of occurrences, the skipped ``exceptions`` (day ordinals)
+    included. Monthly and yearly rules without weekdays repeat the day
+    of the month of ``start``, skipping months that lack it.
+    """
+
+    __slots__ = ("id", "text", "start", "freq", "interval", "byweekday",
+                 "until", "count", "exceptions", "created", "_end")
+
+    def __init__(self, id, text, start, freq, interval=1, byweekday=None,
+                 until=None, count=None, exceptions=(), created=""):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unknown frequency {freq!r}")
+        self.id = id
+        self.text = text
+        self.start = start
+        self.freq = freq
+        self.interval = max(1, int(interval))
+        self.byweekday = tuple(sorted(set(byweekday))) if byweekday else None
+        self.until = until
+        self.count = count
+        self.exceptions = frozenset(exceptions)
+        self.created = created
+        self._end = None
+
+    @classmethod
+    def from_dict(cls, data):
+        until = data.get('until')
+        created_at = data.get('created_at', "")
+        created = parse_created_at(created_at)
+        return cls(data['id'], data.get('text', ''), parse_date_key(data['start']),
+                   data.get('freq', "daily"), data.get('interval', 1), data.get('byweekday'),
+                   None if until is None else parse_date_key(until), data.get('count'),
+                   [parse_date_key(day) for day in data.get('exceptions', [])],
+                   created_at if created is None else created)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "text": self.text,
+            "start": format_date_key(self.start),
+            "freq": self.freq,
+            "interval": self.interval,
+            "byweekday": list(self.byweekday) if self.byweekday else None,
+            "until": None if self.until is None else format_date_key(self.until),
+            "count": self.count,
+            "exceptions": [format_date_key(day) for day in sorted(self.exceptions)],
+            "created_at": self.occurrence(self.start).created_at
+        }
+
+    @property
+    def end(self):
+        """Last day the rule can occur on"""
+        if self._end is None:
+            end = _MAX_DAY if self.until is None else self.until
+            if self.count is not None:
+                last = None
+                for n, day in enumerate(self._days(self.start, end), 1):
+                    last = day
+                    if n >= self.count:
+                        break
+                end = self.start - 1 if last is None else last
+            self._end = end
+        return self._end
+
+    @property
+    def first(self):
+        """First day the rule falls on, skipped or not, or None if it
+        never occurs"""
+        return next(self._days(self.start, self.end), None)
+
+    def _days(self, lo, hi):
+        """Days from lo to hi the rule falls on, ascending, ignoring count
+        and exceptions"""
+        start, interval = self.start, self.interval
+        lo = max(lo, start)
+        if self.until is not None:
+            hi = min(hi, self.until)
+        if lo > hi:
+            return
+        if self.freq == "daily":
+            days = range(_first_period(start, lo, interval), hi + 1, interval)
+            if self.byweekday:
+                weekdays = self.byweekday
+                days = (day for day in days if weekday(day) in weekdays)
+            yield from days
+        elif self.freq == "weekly":
+            weekdays = self.byweekday or (weekday(start),)
+            first_monday = start - weekday(start)
+            week = _first_period(0, (lo - first_monday) // 7, interval)
+            for monday in range(first_monday + 7 * week, hi + 1, 7 * interval):
+                for wd in weekdays:
+                    if lo <= monday + wd <= hi:
+                        yield monday + wd
+        elif self.freq == "monthly":
+            first = date.fromordinal(start)
+            start_index = first.year * 12 + first.month - 1
+            index = _first_period(start_index, _month_index(lo), interval)
+            last_index = _month_index(hi)
+            while index <= last_index:
+                year, month = divmod(index, 12)
+                month += 1
+                if self.byweekday:
+                    first_day = date(year, month, 1).toordinal()
+                    yield from _weekdays_between(max(lo, first_day),
+                                                 min(hi, first_day + monthrange(year, month)[1] - 1),
+                                                 self.byweekday)
+                elif first.day <= monthrange(year, month)[1]:
+                    # Months without that day (e.g. the 31st) are skipped
+                    day = date(year, month, first.day).toordinal()
+                    if lo <= day <= hi:
+                        yield day
+                index += interval
+        else:
+            first = date.fromordinal(start)
+            year = _first_period(first.year, date.fromordinal(lo).year, interval)
+            last_year = date.fromordinal(hi).year
+            while year <= last_year:
+                if self.byweekday:
+                    yield from _weekdays_between(max(lo, date(year, 1, 1).toordinal()),
+                                                 min(hi, date(year, 12, 31).toordinal()),
+                                                 self.byweekday)
+                elif first.day <= monthrange(year, first.month)[1]:
+                    # 29 February only comes round in leap years
+                    day = date(year, first.month, first.day).toordinal()
+                    if lo <= day <= hi:
+                        yield day
+                year += interval
+
+    def occurrences(self, lo, hi):
+        """Yield the days from lo to hi (ordinals, inclusive) the event
+        occurs on, ascending"""
+        hi = min(hi, self.end)
+        exceptions = self.exceptions
+        for day in self._days(lo, hi):
+            if day not in exceptions:
+                yield day
+
+    def occurrence(self, day):
+        return Occurrence(self, day)
+
+    def __repr__(self):
+        return (f"Rule(id={self.id!r}, text={self.text!r}, freq={self.freq!r}, "
+                f"start={format_date_key(self.start)!r})")
+
+
+# ==================== OCCURRENCES ====================
+
+class Occurrence(Event):
+    """One date of a recurring event. It has no ID of its own (``id`` is
+    None); ``rule`` is the Rule it comes from."""
+
+    __slots__ = ("rule",)
+
+    def __init__(self, rule, day):
+        super().__init__(None, rule.text, day, rule.created)
+        self.rule = rule
+
+    def __repr__(self):
+        return f"Occurrence(rule={self.rule.id!r}, text={self.text!r}, day={self.day!r})"
+
+
+def _month_spans(lo, hi, reverse):
+    """Split the days lo..hi into calendar months, (first, last) each"""
+    spans = []
+    day = lo
+    while day <= hi:
+        d = date.fromordinal(day)
+        last = min(hi, day + monthrange(d.year, d.month)[1] - d.day)
+        spans.append((day, last))
+        day = last + 1
+    return reversed(spans) if reverse else spans
+
+
+class RecurringEvents:
+    """The recurring event rules of a RuleFile, expanded on demand.
+
+    Only the rules whose first and last days overlap the requested range
+    are expanded, and only for that range, so showing a month costs the
+    occurrences in that month whatever the rules' spans. The file is read
+    again when its signature changes.
+    """
+
+    def __init__(self, rule_file, on_error=None):
+        self.rule_file = rule_file
+        self.on_error = on_error
+        self._rules = []
+        # Start day of each rule in self._rules, which is sorted by it
+        self._starts = []
+        self._loaded = False
+        self._signature = None
+        # (lo, hi) -> counts() result, least recently used first
+        self._counts = OrderedDict()
+
+    def _report(self, message):
+        if self.on_error is not None:
+            self.on_error(message)
+
+    # ==================== LOADING ====================
+
+    def refresh(self):
+        """Re-read the rules if the file changed since it was last read"""
+        try:
+            signature = self.rule_file.signature()
+        except OSError:
+            signature = None
+        if self._loaded and signature == self._signature:
+            return
+        rules = []
+        try:
+            data, _ = self.rule_file.load()
+            rules = [Rule.from_dict(rule) for rule in data]
+        except StorageError as e:
+            self._report(str(e))
+        except Exception as e:
+            self._report(f"Failed to load recurring events: {str(e)}")
+        rules.sort(key=lambda rule: rule.start)
+        self._rules = rules
+        self._starts = [rule.start for rule in rules]
+        self._counts.clear()
+        self._signature = signature
+        self._loaded = True
+
+    def rules(self):
+        self.refresh()
+        return self._rules
+
+    def find(self, rule_id):
+        for rule in self.rules():
+            if rule.id == rule_id:
+                return rule
+        return None
+
+    # ==================== EXPANSION ====================
+
+    def _active(self, lo, hi):
+        """Rules that may occur between the days lo and hi"""
+        rules = self._rules
+        return [rule for rule in rules[:bisect.bisect_right(self._starts, hi)]
+                if rule.end >= lo]
+
+    def iter_days(self, lo, hi):
+        """Yield (day, Rule) for every occurrence from day lo to hi
+        (ordinals, inclusive), ordered by rule rather than by day"""
+        self.refresh()
+        for rule in self._active(lo, hi):
+            for day in rule.occurrences(lo, hi):
+                yield day, rule
+
+    def counts(self, lo, hi):
+        """Return {day: number of occurrences} for the days lo..hi (do not
+        modify). The last COUNTS_CACHE_SIZE ranges are remembered until
+        the rules change."""
+        self.refresh()
+        key = (lo, hi)
+        counts = self._counts.get(key)
+        if counts is not None:
+            self._counts.move_to_end(key)
+            return counts
+        counts = {}
+        for day, _ in self.iter_days(lo, hi):
+            counts[day] = counts.get(day, 0) + 1
+        self._counts[key] = counts
+        if len(self._counts) > COUNTS_CACHE_SIZE:
+            self._counts.popitem(last=False)
+        return counts
+
+    def occurrences(self, lo, hi, reverse=False):
+        """Yield Occurrences from day lo to hi in (date, created) order.
+
+        They are produced a month at a time, so a caller that stops early
+        never expands the rest of the range.
+        """
+        self.refresh()
+        if not self._rules:
+            return
+        # Nothing happens before the earliest start
+        lo = max(lo, self._starts[0])
+        for first, last in _month_spans(lo, hi, reverse):
+            month = sorted((rule.occurrence(day) for day, rule in self.iter_days(first, last)),
+                           key=Occurrence.sort_key, reverse=reverse)
+            yield from month
+
+    def occurrences_on(self, day):
+        return sorted((rule.occurrence(day) for _, rule in self.iter_days(day, day)),
+                      key=Occurrence.sort_key)
+
+    # ==================== MUTATIONS ====================
+
+    def _change(self, change):
+        """Apply change(rule dicts, next_id) -> (result, next_id) to the
+        file under its lock; returns the result, or None if it failed"""
+        try:
+            with self.rule_file.lock:
+                data, next_id = self.rule_file.load()
+                result, next_id = change(data, next_id)
+                if result is not None:
+                    self.rule_file.save(data, next_id)
+        except StorageError as e:
+            self._report(str(e))
+            return None
+        except Exception as e:
+            self._report(f"Failed to save recurring events: {str(e)}")
+            return None
+        self._loaded = False
+        return result
+
+    def add(self, date_str, text, freq, interval=1, byweekday=None, until=None, count=None):
+        """Add a rule starting on date_str and return its ID (None if it
+        could not be saved). ``until`` is a 'YYYY-MM-DD' key."""
+        start = parse_date_key(date_str)
+        if start is None:
+            raise ValueError(f"Invalid date: {date_str}")
+        created = parse_created_at(datetime.now().strftime("%Y-%m-%d %H:%M"))
+
+        def change(data, next_id):
+            rule = Rule(next_id, text, start, freq, interval, byweekday,
+                        None if until is None else parse_date_key(until), count, (), created)
+            data.append(rule.to_dict())
+            return rule.id, next_id + 1
+
+        return self._change(change)
+
+    def add_many(self, rules):
+        """Add rules given as rule file dicts without an ``id`` (see
+        ical.vevent_to_rule) and return their IDs (None if they could not
+        be saved)"""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        def change(data, next_id):
+            rule_ids = []
+            for rule in rules:
+                rule = Rule.from_dict(dict(rule, id=next_id,
+                                           created_at=rule.get('created_at') or now))
+                data.append(rule.to_dict())
+                rule_ids.append(rule.id)
+                next_id += 1
+            return rule_ids, next_id
+
+        return self._change(change)
+
+    def delete(self, rule_id):
+        """Delete a rule and every occurrence of it"""
+        def change(data, next_id):
+            for i, rule in enumerate(data):
+                if rule['id'] == rule_id:
+                    del data[i]
+                    return True, next_id
+            return None, next_id
+
+        return bool(self._change(change))
+
+    def skip(self, rule_id, date_str):
+        """Drop the occurrence of a rule on one date"""
+        def change(data, next_id):
+            for rule in data:
+                if rule['id'] == rule_id:
+                    exceptions = rule.setdefault('exceptions', [])
+                    if date_str not in exceptions:
+                        exceptions.append(date_str)
+                        exceptions.sort()
+                    return True, next_id
+            return None, next_id
+
+        return bool(self._change(change))
@@ -0,0 +1,66 @@
+import bisect
+import re
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class TextIndex:
+    """Inverted index from word tokens to the documents that use them.
+
+    Each document is added under a hashable key together with the value
+    search() should return for it. Tokens are also kept in a sorted list
+    so a prefix query is a bisect range over the vocabulary.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._tokens = []
+        self._docs = {}
+
+    def add(self, key, text, value):
+        self._docs[key] = value
+        for token in set(tokenize(text)):
+            keys = self._postings.get(token)
+            if keys is None:
+                keys = self._postings[token] = set()
+                bisect.insort(self._tokens, token)
+            keys.add(key)
+
+    def remove(self, key, text):
+        self._docs.pop(key, None)
+        for token in set(tokenize(text)):
+            keys = self._postings.get(token)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def _keys_with_prefix(self, prefix):
+        i = bisect.bisect_left(self._tokens, prefix)
+        j = i
+        while j < len(self._tokens) and self._tokens[j].startswith(prefix):
+            j += 1
+        if j - i == 1:
+            return self._postings[self._tokens[i]]
+        return set().union(*(self._postings[token] for token in self._tokens[i:j]))
+
+    def search(self, query):
+        """Return the values of documents with a word starting with each
+        word of the query"""
+        keys = None
+        # Start from the rarest term so the intersections stay small
+        for prefix_keys in sorted((self._keys_with_prefix(term) for term in tokenize(query)),
+                                  key=len):
+            keys = prefix_keys if keys is None else keys & prefix_keys
+            if not keys:
+                return []
+        if keys is None:
+            return []
+        return [self._docs[key] for key in keys]
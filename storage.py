@@ -0,0 +1,1155 @@
+import json
+import mmap
+import os
+import re
+import sqlite3
+from binary_format import decode_events, encode_events
+from event_model import Event, parse_date_key
+from file_lock import FileLock
+
+# Top-level key of the JSON snapshot holding bookkeeping, not events
+META_KEY = "_meta"
+
+# Compact the journal into the snapshot once it grows past either limit
+# and has reached half the size of the snapshot, so bulk writes to a big
+# file do not rewrite it every few hundred events
+JOURNAL_MAX_ENTRIES = 500
+JOURNAL_MAX_BYTES = 256 * 1024
+
+# Rows SqliteBackend.iter_sorted() reads per query
+SQLITE_PAGE_SIZE = 500
+# Dates a lazy JsonBackend.iter_sorted() reads at a time
+JSON_DATES_PER_READ = 32
+
+
+class StorageError(Exception):
+    """Raised by a backend with a message that can be shown to the user"""
+
+
+def events_from_json(data):
+    """Convert {date: [event dict, ...]} into {date: [Event, ...]}"""
+    events = {}
+    for date_str, event_list in data.items():
+        day = parse_date_key(date_str)
+        events[date_str] = [Event.from_dict(event, day) for event in event_list]
+    return events
+
+
+def events_to_json(events):
+    """Convert {date: [Event, ...]} back into plain dicts"""
+    return {date_str: [event.to_dict() for event in event_list]
+            for date_str, event_list in events.items()}
+
+
+def _position(event_list, op):
+    if 'index' in op:
+        # Journals written before IDs were global delete by position
+        return op['index'] if 0 <= op['index'] < len(event_list) else -1
+    for i, event in enumerate(event_list):
+        if event.id == op['id']:
+            return i
+    return -1
+
+
+def apply_op(events, op):
+    """Apply one mutation record to a {date: [Event, ...]} mapping and
+    return the Event it added, removed or updated"""
+    date_str = op['date']
+    if op['op'] == "add":
+        event = Event.from_dict(op['event'], parse_date_key(date_str))
+        events.setdefault(date_str, []).append(event)
+        return event
+
+    event_list = events.get(date_str, [])
+    i = _position(event_list, op)
+    if i < 0:
+        return None
+    if op['op'] == "delete":
+        event = event_list.pop(i)
+    elif op['op'] == "update":
+        event = event_list[i]
+        if 'text' in op:
+            event.text = op['text']
+        new_date = op.get('new_date', date_str)
+        if new_date != date_str:
+            event_list.pop(i)
+            event.day = parse_date_key(new_date)
+            events.setdefault(new_date, []).append(event)
+    else:
+        return None
+    if not event_list:
+        events.pop(date_str, None)
+    return event
+
+
+def rebase_ops(ops, next_id, reserve=None):
+    """Give add ops whose IDs were handed out in the meantime (those below
+    the stored next_id) fresh ones, the first from ``reserve(count, start)``
+    when given. Returns (ops, {old ID: new ID})."""
+    # Past every ID the ops add too, so a fresh ID never meets a kept one
+    fresh = max([next_id] + [op['event']['id'] + 1 for op in ops if op['op'] == "add"])
+    if reserve is not None:
+        count = sum(1 for op in ops if op['op'] == "add" and op['event']['id'] < next_id)
+        if count:
+            fresh = reserve(count, fresh)
+    renamed = {}
+    rebased = []
+    for op in ops:
+        if op['op'] == "add" and op['event']['id'] < next_id:
+            renamed[op['event']['id']] = fresh
+            op = dict(op, event=dict(op['event'], id=fresh))
+            fresh += 1
+        elif op.get('id') in renamed:
+            op = dict(op, id=renamed[op['id']])
+        rebased.append(op)
+    return rebased, renamed
+
+
+def renumber_duplicate_ids(events):
+    """Give every event a new sequential ID if any ID is used twice.
+
+    Files written before IDs were global numbered events per date.
+    Returns the next free ID, or None when nothing had to change.
+    """
+    seen = set()
+    for event_list in events.values():
+        for event in event_list:
+            if event.id in seen:
+                break
+            seen.add(event.id)
+        else:
+            continue
+        break
+    else:
+        return None
+    next_id = 1
+    for event_list in events.values():
+        for event in event_list:
+            event.id = next_id
+            next_id += 1
+    return next_id
+
+
+def replace_file(tmp_path, path):
+    """Rename tmp_path over path, giving it a later modification time than
+    the file it replaces. Two writes within the file system's timestamp
+    resolution could otherwise leave an identical (mtime, size) signature."""
+    try:
+        previous = os.stat(path).st_mtime_ns
+    except OSError:
+        previous = None
+    if previous is not None:
+        mtime = os.stat(tmp_path).st_mtime_ns
+        if mtime <= previous:
+            # A microsecond, as some file systems store 100 ns steps
+            mtime = previous + 1000
+            os.utime(tmp_path, ns=(mtime, mtime))
+    os.replace(tmp_path, path)
+
+
+# ==================== BACKEND INTERFACE ====================
+
+class StorageBackend:
+    """Where an EventStore keeps its events.
+
+    Mutations reach the backend as the same op records ``apply_op``
+    understands, after they have been applied in memory. Other processes
+    may write to the same data; backends hold a lock while they read or
+    write and keep a version counter that tells them when that happened.
+    """
+
+    # True when load_date() can read one date without loading everything
+    supports_partial_load = False
+    # True when iter_sorted() reads events in order without loading them all
+    supports_sorted_iteration = False
+
+    def signature(self):
+        """Return a value that changes when the data is changed elsewhere"""
+        raise NotImplementedError
+
+    def load(self):
+        """Return every event as {date: [Event, ...]}"""
+        raise NotImplementedError
+
+    def load_date(self, date_str):
+        """Return the events of one date"""
+        return self.load().get(date_str, [])
+
+    def load_range(self, start, end):
+        """Return {date: [Event, ...]} for the date keys from start to end"""
+        return {date_str: event_list for date_str, event_list in self.load().items()
+                if start <= date_str <= end and parse_date_key(date_str) is not None}
+
+    def months(self):
+        """Return the sorted 'YYYY-MM' months holding events if the backend
+        stores events by month, otherwise None"""
+        return None
+
+    def iter_sorted(self, reverse=True, start=None, limit=None):
+        """Yield dated Events in (date, created) order, like
+        EventStore.iter_events()"""
+        raise NotImplementedError
+
+    def next_id(self):
+        """Return an event ID that has never been used"""
+        raise NotImplementedError
+
+    def commit(self, op, events):
+        """Persist one mutation; ``events`` is the state after applying it,
+        or None when the caller has only some dates loaded"""
+        raise NotImplementedError
+
+    def commit_many(self, ops, events, reserve=None):
+        """Persist several mutations at once.
+
+        Returns None if nobody else wrote since this backend last read or
+        wrote. Otherwise the ops were applied on top of the other writes
+        and the result is a (possibly empty) {old ID: new ID} of added
+        events that had to be renumbered because their IDs were taken in
+        the meantime; the caller's copy is stale. ``reserve(count, start)``
+        returns the first of the new IDs, so a caller still handing out
+        IDs can keep them apart.
+        """
+        for op in ops:
+            self.commit(op, events)
+
+    def save(self, events):
+        """Replace everything with ``events``"""
+        raise NotImplementedError
+
+
+# ==================== SNAPSHOT OFFSET INDEX ====================
+
+# A JSON object key (with its colon), a string, or a bracket
+_JSON_SPACE_RE = re.compile(r"[ \t\n\r]*")
+_JSON_DECODER = json.JSONDecoder()
+
+
+def parse_with_offsets(text):
+    """Parse the JSON object in text, also returning the UTF-8 byte spans
+    of its top-level values: (dict, {key: (start, end)}). The values are
+    decoded one at a time, so this costs little more than json.loads().
+    Raises ValueError when text is not one whole object."""
+    space = _JSON_SPACE_RE.match
+    i = space(text).end()
+    if text[i:i + 1] != "{":
+        raise ValueError("not a JSON object")
+    i = space(text, i + 1).end()
+    data = {}
+    offsets = {}
+    # Byte offsets differ from character offsets only past non-ASCII text
+    ascii = text.isascii()
+    pos = last = 0
+    closing = text[i:i + 1] == "}"
+    while not closing:
+        key, i = _JSON_DECODER.raw_decode(text, i)
+        if not isinstance(key, str):
+            raise ValueError("object key is not a string")
+        i = space(text, i).end()
+        if text[i:i + 1] != ":":
+            raise ValueError("expected ':'")
+        i = space(text, i + 1).end()
+        data[key], end = _JSON_DECODER.raw_decode(text, i)
+        if ascii:
+            offsets[key] = (i, end)
+        else:
+            start = pos + len(text[last:i].encode("utf-8"))
+            pos = start + len(text[i:end].encode("utf-8"))
+            last = end
+            offsets[key] = (start, pos)
+        i = space(text, end).end()
+        closing = text[i:i + 1] == "}"
+        if not closing:
+            if text[i:i + 1] != ",":
+                raise ValueError("expected ',' or '}'")
+            i = space(text, i + 1).end()
+    if space(text, i + 1).end() != len(text):
+        raise ValueError("extra data after the object")
+    return data, offsets
+
+
+def dump_with_offsets(data, f):
+    """Write data to binary file f exactly like json.dump(indent=4) and
+    return the parse_with_offsets() spans of its top-level values"""
+    if not data:
+        f.write(b"{}")
+        return {}
+    offsets = {}
+    pos = f.write(b"{\n")
+    last = len(data) - 1
+    for i, (key, value) in enumerate(data.items()):
+        pos += f.write(("    " + json.dumps(key, ensure_ascii=False) + ": ").encode("utf-8"))
+        # JSON strings never contain a raw newline, so this only indents
+        body = json.dumps(value, indent=4, ensure_ascii=False).replace("\n", "\n    ")
+        end = pos + f.write(body.encode("utf-8"))
+        offsets[key] = (pos, end)
+        pos = end + f.write(b",\n" if i < last else b"\n")
+    f.write(b"}")
+    return offsets
+
+
+# ==================== JSON FILE ====================
+
+class JsonBackend(StorageBackend):
+    """The events file, optionally with an append-only journal.
+
+    In journal mode each mutation is appended as one JSON line to
+    ``<path>.journal`` instead of rewriting the whole snapshot; loading
+    replays the journal over the snapshot and the two are merged again
+    once the journal passes JOURNAL_MAX_ENTRIES or JOURNAL_MAX_BYTES and
+    half the size of the snapshot. Every write bumps a version counter
+    (the journal sequence number, kept in the snapshot's meta) and
+    happens under ``<path>.lock``.
+
+    With ``lazy=True`` single dates are read by memory-mapping the
+    snapshot and decoding only that date's list. The byte offset of
+    every date is kept in a ``<path>.index`` sidecar, written with each
+    snapshot and rebuilt while parsing it when it does not match the file.
+    The same offsets let iter_sorted() read a few dates at a time in order.
+    """
+
+    def __init__(self, path, journal=False, lazy=False):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.index_path = path + ".index"
+        self.journal = journal
+        self.supports_partial_load = lazy
+        self.supports_sorted_iteration = lazy
+        self._lock = FileLock(path + ".lock")
+        self._meta = {}
+        self._seq = 0
+        # Journal position the caller's full copy of the events matches:
+        # set by load() and by writes of that copy, not by internal reloads
+        self._caller_seq = None
+        self._next_id = 1
+        self._journal_entries = 0
+        self._journal_torn = False
+        self._snapshot_bytes = 0
+        # Journal ops newer than the snapshot, for lazy loading
+        self._pending_ops = []
+        # signature() when _seq, _next_id and _pending_ops were last known
+        self._state_signature = None
+        self._offsets = None
+        self._offsets_stat = None
+
+    def signature(self):
+        signature = []
+        for path in (self.path, self.journal_path):
+            try:
+                st = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def _read_snapshot(self):
+        """Return the snapshot as ({date: [Event, ...]}, meta); with lazy
+        loading, also refresh the index if it does not match the file"""
+        if not os.path.exists(self.path):
+            return {}, {}
+        stat = self._snapshot_stat()
+        # Newlines kept as they are, so offsets match the bytes on disk
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            content = f.read()
+        self._snapshot_bytes = len(content)
+        if not content.strip():
+            return {}, {}
+        try:
+            if self.supports_partial_load and self._indexed_offsets(stat) is None:
+                data, offsets = parse_with_offsets(content)
+                self._write_index(offsets, stat)
+            else:
+                data = json.loads(content)
+        except ValueError:
+            raise self._set_aside("is corrupted")
+        meta = data.pop(META_KEY, None) or {}
+        return events_from_json(data), meta
+
+    def _set_aside(self, problem):
+        """Move an unreadable snapshot out of the way, so loading starts
+        over from an empty one, and return the error telling the user"""
+        aside = self.path + ".corrupt"
+        n = 1
+        while os.path.exists(aside):
+            aside = f"{self.path}.corrupt{n}"
+            n += 1
+        os.replace(self.path, aside)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        self._offsets = self._offsets_stat = None
+        self._state_signature = None
+        return StorageError(f"Events file '{self.path}' {problem}. It was moved to '{aside}' "
+                            f"and a new events file will be created.")
+
+    def _write_snapshot(self, f, events, meta):
+        """Write the snapshot to binary file f; returns the date offsets"""
+        data = events_to_json(events)
+        data[META_KEY] = meta
+        return dump_with_offsets(data, f)
+
+    def _read_journal(self):
+        """Return the journal entries newer than the snapshot"""
+        self._journal_entries = 0
+        self._journal_torn = False
+        self._pending_ops = []
+        if not os.path.exists(self.journal_path):
+            return self._pending_ops
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted append; the
+                    # next write must rewrite the snapshot instead
+                    self._journal_torn = True
+                    break
+                self._journal_entries += 1
+                if op.get('seq', 0) > self._seq:
+                    self._pending_ops.append(op)
+                    self._track_id(op)
+                    self._seq = op['seq']
+        return self._pending_ops
+
+    def _track_id(self, op):
+        if op['op'] == "add":
+            self._next_id = max(self._next_id, op['event']['id'] + 1)
+
+    @staticmethod
+    def _next_free_id(events, next_id):
+        return max([next_id] + [event.id + 1 for event_list in events.values()
+                                for event in event_list])
+
+    def load(self):
+        with self._lock:
+            events = self._load()
+            self._caller_seq = self._seq
+            return events
+
+    def _load(self):
+        events, self._meta = self._read_snapshot()
+        self._seq = self._meta.get('journal_seq', 0)
+        self._next_id = self._next_free_id(events, self._meta.get('next_id', 1))
+        for op in self._read_journal():
+            apply_op(events, op)
+        self._state_signature = self.signature()
+        next_id = renumber_duplicate_ids(events)
+        if next_id is not None:
+            # One-off upgrade of a file with per-date IDs
+            self._next_id = next_id
+            self._save(events)
+        return events
+
+    # ---------- lazy loading ----------
+
+    def _snapshot_stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
+
+    def _read_spans(self, spans):
+        """Decode the JSON values at the given byte spans of the snapshot"""
+        if not spans:
+            return []
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return [json.loads(mm[start:end]) for start, end in spans]
+
+    def _write_index(self, offsets, stat):
+        self._offsets = offsets
+        self._offsets_stat = stat
+        try:
+            with open(self.index_path, "w", encoding="utf-8") as f:
+                json.dump({"snapshot": stat, "offsets": offsets}, f, ensure_ascii=False)
+        except OSError:
+            # Only a cache; it is rebuilt next time
+            pass
+
+    def _indexed_offsets(self, stat):
+        """Return the offsets known for a snapshot with this stat, from
+        memory or the index file, or None when they have to be rebuilt"""
+        if stat is None or stat[1] == 0:
+            return {}
+        if self._offsets_stat == stat:
+            return self._offsets
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index['snapshot'] == stat:
+                self._offsets = {key: tuple(span) for key, span in index['offsets'].items()}
+                self._offsets_stat = stat
+                return self._offsets
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _date_offsets(self):
+        """Return {key: (start, end)} for the current snapshot"""
+        stat = self._snapshot_stat()
+        offsets = self._indexed_offsets(stat)
+        if offsets is None:
+            # Rebuilt by parsing the snapshot once
+            self._read_snapshot()
+            offsets = self._offsets
+        return offsets
+
+    def _in_sync(self):
+        return self._state_signature is not None and self._state_signature == self.signature()
+
+    def _ensure_state(self):
+        """Know the journal position and next ID without a full load"""
+        if self._in_sync():
+            return
+        offsets = self._indexed_offsets(self._snapshot_stat())
+        if not self.supports_partial_load or offsets is None:
+            # Parsing the whole snapshot gives the state and rebuilds the
+            # index in the same pass
+            events = self._load()
+            if self.supports_partial_load and events and 'next_id' not in self._meta:
+                # Written before snapshots recorded the next ID: rewrite
+                # it once so later opens need not read every event
+                self._save(events)
+            return
+        meta = self._read_spans([offsets[META_KEY]])[0] if META_KEY in offsets else {}
+        if offsets and 'next_id' not in meta:
+            # Indexed, but from before snapshots recorded the next ID
+            self._save(self._load())
+            return
+        self._meta = meta
+        self._seq = meta.get('journal_seq', 0)
+        self._next_id = meta.get('next_id', 1)
+        self._snapshot_bytes = self._snapshot_stat()[1] if offsets else 0
+        self._read_journal()
+        self._state_signature = self.signature()
+
+    def load_date(self, date_str):
+        with self._lock:
+            if not self.supports_partial_load:
+                return self._load().get(date_str, [])
+            return self._load_date(date_str)
+
+    def _load_date(self, date_str):
+        return self._load_dates([date_str])[date_str]
+
+    def _load_dates(self, wanted):
+        """Return {date: [Event, ...]} for each of the wanted dates"""
+        self._ensure_state()
+        offsets = self._date_offsets()
+        touched = set()
+        for op in self._pending_ops:
+            touched.add(op['date'])
+            touched.add(op.get('new_date', op['date']))
+        # Journal ops can move events between dates, so replay them over
+        # every date they mention
+        replay = not touched.isdisjoint(wanted)
+        dates = [key for key in (touched.union(wanted) if replay else wanted)
+                 if key in offsets and key != META_KEY]
+        events = events_from_json(dict(zip(dates, self._read_spans([offsets[key] for key in dates]))))
+        if replay:
+            for op in self._pending_ops:
+                apply_op(events, op)
+        return {date_str: events.get(date_str, []) for date_str in wanted}
+
+    def iter_sorted(self, reverse=True, start=None, limit=None):
+        # A few dates per read, each read under the lock and picking up
+        # after the last date of the one before, so nothing is held
+        # between the caller's steps
+        yielded = 0
+        last = None
+        while limit is None or yielded < limit:
+            with self._lock:
+                self._ensure_state()
+                keys = set(self._date_offsets())
+                for op in self._pending_ops:
+                    keys.add(op['date'])
+                    keys.add(op.get('new_date', op['date']))
+                if reverse:
+                    keys = [key for key in keys if (start is None or key <= start)
+                            and (last is None or key < last)]
+                else:
+                    keys = [key for key in keys if (start is None or key >= start)
+                            and (last is None or key > last)]
+                dates = sorted((key for key in keys if parse_date_key(key) is not None),
+                               reverse=reverse)[:JSON_DATES_PER_READ]
+                if not dates:
+                    return
+                loaded = self._load_dates(dates)
+            for date_str in dates:
+                for event in sorted(loaded[date_str], key=lambda e: e.sort_key() + (e.id,),
+                                    reverse=reverse):
+                    if limit is not None and yielded >= limit:
+                        return
+                    yield event
+                    yielded += 1
+            last = dates[-1]
+
+    def load_range(self, start, end):
+        if not self.supports_partial_load:
+            return super().load_range(start, end)
+        with self._lock:
+            self._ensure_state()
+            keys = set(self._date_offsets())
+            for op in self._pending_ops:
+                keys.add(op['date'])
+                keys.add(op.get('new_date', op['date']))
+            events = {}
+            for date_str in sorted(keys):
+                if start <= date_str <= end and parse_date_key(date_str) is not None:
+                    event_list = self._load_date(date_str)
+                    if event_list:
+                        events[date_str] = event_list
+            return events
+
+    def next_id(self):
+        with self._lock:
+            self._ensure_state()
+            return self._next_id
+
+    def save(self, events):
+        with self._lock:
+            self._save(events)
+            self._caller_seq = self._seq
+
+    def _save(self, events):
+        # Events copied from elsewhere may carry IDs this file never issued
+        self._next_id = self._next_free_id(events, self._next_id)
+        self._seq += 1
+        meta = self._meta = dict(self._meta, journal_seq=self._seq, next_id=self._next_id)
+        # Write a temporary file and rename it over the snapshot so a crash
+        # never leaves a half-written events file behind
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            offsets = self._write_snapshot(f, events, meta)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp_path, self.path)
+        stat = self._snapshot_stat()
+        self._snapshot_bytes = stat[1]
+        if self.supports_partial_load:
+            self._write_index(offsets, stat)
+        # Everything in the journal is now part of the snapshot
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_entries = 0
+        self._journal_torn = False
+        self._pending_ops = []
+        self._state_signature = self.signature()
+
+    def commit(self, op, events):
+        return self.commit_many([op], events)
+
+    def commit_many(self, ops, events, reserve=None):
+        with self._lock:
+            return self._commit_many(ops, events, reserve)
+
+    def _commit_many(self, ops, events, reserve):
+        version = self._seq if self._state_signature is not None else None
+        self._ensure_state()
+        ops, renamed = rebase_ops(ops, self._next_id, reserve)
+        if (renamed or self._seq != version
+                or (events is not None and self._caller_seq != self._seq)):
+            # Someone else wrote since we or the caller's copy last looked:
+            # apply the ops on top of what is on disk instead of that copy
+            events = None
+            renamed = renamed or {}
+        else:
+            renamed = None
+        tagged = [dict(op, seq=self._seq + i) for i, op in enumerate(ops, 1)]
+        lines = "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in tagged)
+        if not self.journal or self._journal_torn or self._journal_full(len(tagged), lines):
+            # Rewriting the snapshot reads it before anything is written,
+            # so an unreadable one fails the write instead of leaving ops
+            # in the journal that were reported lost
+            if events is None:
+                # Only some dates are in memory; rebuild the rest from disk
+                merged = self._load()
+                for op in ops:
+                    apply_op(merged, op)
+            for op in ops:
+                self._track_id(op)
+            self._save(merged if events is None else events)
+            if events is not None:
+                self._caller_seq = self._seq
+            return renamed
+        for op in ops:
+            self._track_id(op)
+        self._seq = tagged[-1]['seq']
+        self._pending_ops.extend(tagged)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_entries += len(tagged)
+        self._state_signature = self.signature()
+        if events is not None:
+            self._caller_seq = self._seq
+        return renamed
+
+    def _journal_full(self, entries, lines):
+        """Whether appending lines makes the journal due for compaction"""
+        try:
+            journal_bytes = os.path.getsize(self.journal_path)
+        except OSError:
+            journal_bytes = 0
+        journal_bytes += len(lines.encode("utf-8"))
+        return ((self._journal_entries + entries >= JOURNAL_MAX_ENTRIES
+                 or journal_bytes >= JOURNAL_MAX_BYTES)
+                and journal_bytes * 2 >= self._snapshot_bytes)
+
+
+# ==================== BINARY FILE ====================
+
+class BinaryBackend(JsonBackend):
+    """Like JsonBackend, but the snapshot uses the compact format of
+    binary_format, which loads several times faster than JSON.
+
+    The journal stays JSON lines. When the file is created and
+    ``migrate_from`` names an existing JSON events file, that file is
+    converted once.
+    """
+
+    def __init__(self, path, journal=False, migrate_from=None):
+        super().__init__(path, journal=journal)
+        if not os.path.exists(path) and migrate_from and os.path.exists(migrate_from):
+            self.save(JsonBackend(migrate_from).load())
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.path):
+            return {}, {}
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self._snapshot_bytes = len(data)
+        if not data:
+            return {}, {}
+        try:
+            return decode_events(data)
+        except ValueError as e:
+            raise self._set_aside(f"could not be read ({e})")
+
+    def _write_snapshot(self, f, events, meta):
+        f.write(encode_events(events, meta))
+        return None
+
+
+# ==================== MONTHLY SHARDS ====================
+
+# Shard for keys that are not 'YYYY-MM-DD' dates
+OTHER_SHARD = "other"
+
+
+def shard_name(date_str):
+    """Return the shard holding a date key: its 'YYYY-MM' month"""
+    return date_str[:7] if parse_date_key(date_str) is not None else OTHER_SHARD
+
+
+class ShardedBackend(StorageBackend):
+    """Events split into one JSON file per month inside a directory.
+
+    ``<directory>/2026-03.json`` holds the dates of March 2026 in the
+    layout of the single events file. ``manifest.json`` lists the shards
+    with their event counts and holds the next event ID and a version
+    counter bumped by every write. Reading a date or month opens one
+    shard and a mutation rewrites only the shards it touches, under
+    ``<directory>/.lock``. When the directory is new and
+    ``migrate_from`` names an existing JSON events file, that file is
+    split up once.
+    """
+
+    supports_partial_load = True
+
+    def __init__(self, directory, migrate_from=None):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self._lock = FileLock(os.path.join(directory, ".lock"))
+        # Manifest version when this backend first read or last wrote
+        self._version = None
+        # Shard name -> (manifest version, plain JSON data) of the last read
+        self._shards = {}
+        if not os.path.exists(self.manifest_path):
+            os.makedirs(directory, exist_ok=True)
+            if migrate_from and os.path.exists(migrate_from):
+                self.save(JsonBackend(migrate_from).load())
+
+    def _shard_path(self, name):
+        return os.path.join(self.directory, name + ".json")
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read_json(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            raise StorageError(f"Events file '{path}' is corrupted.")
+
+    def _write_json(self, path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp_path, path)
+
+    def _read_manifest(self):
+        # Small, and read every time so the version is always current
+        if not os.path.exists(self.manifest_path):
+            return {"version": 0, "next_id": 1, "shards": {}}
+        return self._read_json(self.manifest_path)
+
+    def _seen(self):
+        """Return the manifest, remembering its version on first read"""
+        manifest = self._read_manifest()
+        if self._version is None:
+            self._version = manifest.get('version', 0)
+        return manifest
+
+    def _read_shard(self, name, version):
+        """Return a shard as plain {date: [event dict, ...]} data"""
+        path = self._shard_path(name)
+        if not os.path.exists(path):
+            return {}
+        # Every write bumps the version, so a cached shard of the same
+        # version is current
+        cached = self._shards.get(name)
+        if cached is None or cached[0] != version:
+            cached = self._shards[name] = (version, self._read_json(path))
+        return cached[1]
+
+    def signature(self):
+        # Every write replaces the manifest
+        return self._stat(self.manifest_path)
+
+    def months(self):
+        with self._lock:
+            return sorted(name for name in self._seen()['shards'] if name != OTHER_SHARD)
+
+    def load(self):
+        with self._lock:
+            manifest = self._seen()
+            events = {}
+            for name in sorted(manifest['shards']):
+                events.update(events_from_json(self._read_shard(name, manifest.get('version', 0))))
+            return events
+
+    def load_date(self, date_str):
+        with self._lock:
+            manifest = self._seen()
+            data = self._read_shard(shard_name(date_str), manifest.get('version', 0))
+        if not data.get(date_str):
+            return []
+        return events_from_json({date_str: data[date_str]})[date_str]
+
+    def load_range(self, start, end):
+        with self._lock:
+            manifest = self._seen()
+            events = {}
+            for name in sorted(manifest['shards']):
+                if name != OTHER_SHARD and start[:7] <= name <= end[:7]:
+                    data = self._read_shard(name, manifest.get('version', 0))
+                    events.update(events_from_json({date_str: data[date_str] for date_str in data
+                                                    if start <= date_str <= end}))
+            return events
+
+    def next_id(self):
+        with self._lock:
+            return self._seen()['next_id']
+
+    def _write_shards(self, manifest, events_by_shard):
+        """Write the manifest, then each shard (removing emptied ones)"""
+        shards = dict(manifest['shards'])
+        for name, events in events_by_shard.items():
+            count = sum(len(event_list) for event_list in events.values())
+            if count:
+                shards[name] = count
+            else:
+                shards.pop(name, None)
+        self._version = manifest.get('version', 0) + 1
+        # The manifest goes first so its next ID is never behind a shard
+        self._write_json(self.manifest_path, {"version": self._version,
+                                              "next_id": manifest['next_id'], "shards": shards})
+        for name, events in events_by_shard.items():
+            path = self._shard_path(name)
+            if name in shards:
+                self._write_json(path, events_to_json(dict(sorted(events.items()))))
+            elif os.path.exists(path):
+                os.remove(path)
+            self._shards.pop(name, None)
+
+    def commit(self, op, events):
+        return self.commit_many([op], events)
+
+    def commit_many(self, ops, events, reserve=None):
+        with self._lock:
+            manifest = dict(self._read_manifest())
+            ops, renamed = rebase_ops(ops, manifest['next_id'], reserve)
+            if not renamed and manifest.get('version', 0) == self._version:
+                renamed = None
+            # The touched shards, read back from disk and merged so an
+            # update can move an event from one month to another
+            merged = {}
+            loaded = set()
+            for op in ops:
+                for date_str in (op['date'], op.get('new_date', op['date'])):
+                    name = shard_name(date_str)
+                    if name not in loaded:
+                        merged.update(events_from_json(
+                            self._read_shard(name, manifest.get('version', 0))))
+                        loaded.add(name)
+                apply_op(merged, op)
+                if op['op'] == "add":
+                    manifest['next_id'] = max(manifest['next_id'], op['event']['id'] + 1)
+            by_shard = {name: {} for name in loaded}
+            for date_str, event_list in merged.items():
+                by_shard[shard_name(date_str)][date_str] = event_list
+            self._write_shards(manifest, by_shard)
+            return renamed
+
+    def save(self, events):
+        with self._lock:
+            manifest = dict(self._read_manifest())
+            manifest['next_id'] = max([manifest['next_id']] +
+                                      [event.id + 1 for event_list in events.values()
+                                       for event in event_list])
+            # Shards that are no longer used are written as empty, i.e. removed
+            by_shard = {name: {} for name in manifest['shards']}
+            for date_str, event_list in events.items():
+                by_shard.setdefault(shard_name(date_str), {})[date_str] = event_list
+            self._write_shards(manifest, by_shard)
+
+
+# ==================== SQLITE ====================
+
+class SqliteBackend(StorageBackend):
+    """Events in a SQLite database indexed by date and creation time.
+
+    Rows keep their insertion order through the rowid, which is also
+    the order of the per-date lists the rest of the app indexes into.
+    When the database is created and ``migrate_from`` names an existing
+    JSON events file, that file is imported once.
+    """
+
+    supports_partial_load = True
+    supports_sorted_iteration = True
+
+    def __init__(self, path, migrate_from=None):
+        self.path = path
+        is_new = not os.path.exists(path)
+        # Writes may come from the EventStore's background writer thread;
+        # other processes hold the database lock only briefly
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # PRAGMA data_version when this connection last read or wrote
+        self._data_version = None
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS events (
+                    date TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_events_date ON events(date);
+                -- Was on created_at alone, which no query could use
+                DROP INDEX IF EXISTS idx_events_created;
+                CREATE INDEX IF NOT EXISTS idx_events_sorted ON events(date, created_at, id);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+            """)
+            duplicates = self._conn.execute(
+                "SELECT COUNT(*) - COUNT(DISTINCT id) FROM events").fetchone()[0]
+            if duplicates:
+                # One-off upgrade of a database with per-date IDs
+                self._conn.execute("UPDATE events SET id = rowid")
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_events_id ON events(id)")
+        if is_new and migrate_from and os.path.exists(migrate_from):
+            self.save(JsonBackend(migrate_from).load())
+
+    def signature(self):
+        # Bumped whenever another connection commits
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _seen(self):
+        if self._data_version is None:
+            self._data_version = self.signature()
+
+    def _rows_to_events(self, rows):
+        events = {}
+        days = {}
+        for date_str, event_id, text, created_at in rows:
+            if date_str not in days:
+                days[date_str] = parse_date_key(date_str)
+            events.setdefault(date_str, []).append(Event.from_dict(
+                {"id": event_id, "text": text, "created_at": created_at}, days[date_str]))
+        return events
+
+    def load(self):
+        self._seen()
+        rows = self._conn.execute(
+            "SELECT date, id, text, created_at FROM events ORDER BY date, rowid")
+        return self._rows_to_events(rows)
+
+    def load_date(self, date_str):
+        self._seen()
+        rows = self._conn.execute(
+            "SELECT date, id, text, created_at FROM events WHERE date = ? ORDER BY rowid",
+            (date_str,))
+        return self._rows_to_events(rows).get(date_str, [])
+
+    def load_range(self, start, end):
+        self._seen()
+        rows = self._conn.execute(
+            "SELECT date, id, text, created_at FROM events WHERE date BETWEEN ? AND ? "
+            "ORDER BY date, rowid", (start, end))
+        return {date_str: event_list for date_str, event_list in self._rows_to_events(rows).items()
+                if parse_date_key(date_str) is not None}
+
+    def iter_sorted(self, reverse=True, start=None, limit=None):
+        # One query per page, each picking up after the last row of the
+        # previous one, so no statement stays open between the caller's
+        # steps and every page is a range scan of idx_events_sorted.
+        # Creation times that are not 'YYYY-MM-DD HH:MM' sort as text
+        # here, where the store puts them last.
+        order = "DESC" if reverse else "ASC"
+        after = "<" if reverse else ">"
+        query = (f"SELECT date, id, text, created_at FROM events WHERE {{}} "
+                 f"ORDER BY date {order}, created_at {order}, id {order} LIMIT ?")
+        if start is None:
+            where, args = "1", ()
+        else:
+            where, args = ("date <= ?" if reverse else "date >= ?"), (start,)
+        yielded = 0
+        while limit is None or yielded < limit:
+            page = SQLITE_PAGE_SIZE if limit is None else min(SQLITE_PAGE_SIZE, limit - yielded)
+            rows = self._conn.execute(query.format(where), args + (page,)).fetchall()
+            for date_str, event_id, text, created_at in rows:
+                day = parse_date_key(date_str)
+                if day is not None:
+                    yield Event.from_dict({"id": event_id, "text": text,
+                                           "created_at": created_at}, day)
+                    yielded += 1
+                    if limit is not None and yielded >= limit:
+                        return
+            if len(rows) < page:
+                return
+            last = rows[-1]
+            where, args = f"(date, created_at, id) {after} (?, ?, ?)", (last[0], last[3], last[1])
+
+    def next_id(self):
+        row = self._conn.execute(
+            "SELECT MAX((SELECT value FROM meta WHERE key = 'next_id'), "
+            "(SELECT IFNULL(MAX(id), 0) + 1 FROM events))").fetchone()
+        return row[0] or 1
+
+    def _insert(self, date_str, event):
+        self._conn.execute(
+            "INSERT INTO events (date, id, text, created_at) VALUES (?, ?, ?, ?)",
+            (date_str, event['id'], event['text'], event['created_at']))
+
+    def _remember_next_id(self):
+        # Kept separately so deleting the newest event never frees its ID
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)",
+                           (self.next_id(),))
+
+    def _commit_op(self, op):
+        if op['op'] == "add":
+            self._insert(op['date'], op['event'])
+        elif op['op'] == "delete":
+            self._conn.execute("DELETE FROM events WHERE id = ?", (op['id'],))
+        elif op['op'] == "update":
+            if 'text' in op:
+                self._conn.execute("UPDATE events SET text = ? WHERE id = ?",
+                                   (op['text'], op['id']))
+            if op.get('new_date', op['date']) != op['date']:
+                # Re-insert so the event goes last on its new date, like in memory
+                row = self._conn.execute("SELECT id, text, created_at FROM events WHERE id = ?",
+                                         (op['id'],)).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM events WHERE id = ?", (op['id'],))
+                    self._insert(op['new_date'],
+                                 {"id": row[0], "text": row[1], "created_at": row[2]})
+
+    def commit(self, op, events):
+        return self.commit_many([op], events)
+
+    def commit_many(self, ops, events, reserve=None):
+        with self._conn:
+            # Take the write lock before looking, so nobody commits between
+            # the check and the writes
+            self._conn.execute("BEGIN IMMEDIATE")
+            version = self.signature()
+            ops, renamed = rebase_ops(ops, self.next_id(), reserve)
+            if not renamed and version == self._data_version:
+                renamed = None
+            for op in ops:
+                self._commit_op(op)
+            self._remember_next_id()
+        self._data_version = version
+        return renamed
+
+    def save(self, events):
+        with self._conn:
+            self._conn.execute("DELETE FROM events")
+            for date_str, event_list in events.items():
+                for event in event_list:
+                    self._insert(date_str, event.to_dict())
+            self._remember_next_id()
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """Copy every event of a JSON events file into a SQLite database"""
+    backend = SqliteBackend(db_path)
+    backend.save(JsonBackend(json_path).load())
+    return backend
+
+
+# ==================== RECURRING RULES ====================
+
+class RuleFile:
+    """JSON file of recurring event rules, {"next_id": n, "rules": [...]}.
+
+    Rules are few and small, so the whole file is read and rewritten;
+    hold ``lock`` around a load and the save based on it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = FileLock(path + ".lock")
+
+    def signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def load(self):
+        """Return (list of rule dicts, next free rule ID)"""
+        if not os.path.exists(self.path):
+            return [], 1
+        with open(self.path, "r", encoding="utf-8") as f:
+            content = f.read()
+        if not content.strip():
+            return [], 1
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            raise StorageError(f"Recurring events file '{self.path}' is corrupted.")
+        rules = data.get('rules', [])
+        next_id = max([data.get('next_id', 1)] + [rule['id'] + 1 for rule in rules])
+        return rules, next_id
+
+    def save(self, rules, next_id):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"next_id": next_id, "rules": rules}, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp_path, self.path)
@@ -0,0 +1,36 @@
+import os
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_dates
+import business_days
+from business_days import BusinessCalendar, default_calendar
+
+
+class SettingsTest(unittest.TestCase):
+    def setUp(self):
+        weekend = business_days.WEEKEND
+        self.addCleanup(setattr, business_days, "WEEKEND", weekend)
+
+    def test_calendar_reads_weekend_when_built(self):
+        business_days.WEEKEND = (4, 5)
+        self.assertEqual(BusinessCalendar().weekend, frozenset((4, 5)))
+
+    def test_default_calendar_follows_changes(self):
+        # Friday 2026-01-09 to Sunday 2026-01-11
+        d1, d2 = date(2026, 1, 9), date(2026, 1, 11)
+        self.assertIs(default_calendar(), default_calendar())
+        self.assertEqual(default_calendar().count(d1, d2), 1)
+        business_days.WEEKEND = (4, 5)
+        self.assertEqual(default_calendar().count(d1, d2), 1)
+        self.assertFalse(default_calendar().is_business_day(d1))
+        self.assertEqual(list(batch_dates.business_day_counts([d1], [d2])), [1])
+        business_days.WEEKEND = (6,)
+        self.assertEqual(list(batch_dates.business_day_counts([d1], [d2])), [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+import unittest
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculators import calculate_duration_details, count_weekdays
+
+
+def walk_weekdays(d1, d2):
+    """The day by day count calculate_duration_details used to do"""
+    if d1 > d2:
+        d1, d2 = d2, d1
+    weekdays = weekends = 0
+    current = d1
+    while current <= d2:
+        if current.weekday() < 5:
+            weekdays += 1
+        else:
+            weekends += 1
+        current += timedelta(days=1)
+    return weekdays, weekends
+
+
+class CountWeekdaysTest(unittest.TestCase):
+    def check(self, d1, d2):
+        expected = walk_weekdays(d1, d2)
+        self.assertEqual(count_weekdays(d1, d2), expected, (d1, d2))
+        details = calculate_duration_details(d1, d2)
+        self.assertEqual((details['weekdays'], details['weekends']), expected, (d1, d2))
+
+    def test_same_day(self):
+        # Every weekday, Monday 2026-01-05 to Sunday 2026-01-11
+        for offset in range(7):
+            day = datetime(2026, 1, 5) + timedelta(days=offset)
+            self.check(day, day)
+
+    def test_year_boundary(self):
+        for start in range(7):
+            d1 = datetime(2025, 12, 25) + timedelta(days=start)
+            for length in range(15):
+                self.check(d1, d1 + timedelta(days=length))
+
+    def test_reversed_range(self):
+        d1, d2 = datetime(2024, 2, 27), datetime(2024, 3, 4)
+        self.assertEqual(count_weekdays(d2, d1), count_weekdays(d1, d2))
+        self.check(d2, d1)
+
+    def test_random_spans(self):
+        rng = random.Random(1)
+        first = date(1900, 1, 1).toordinal()
+        for _ in range(2000):
+            d1 = datetime.fromordinal(first + rng.randrange(73_000))
+            d2 = d1 + timedelta(days=rng.choice((rng.randrange(15), rng.randrange(800),
+                                                 rng.randrange(3000))))
+            if rng.random() < 0.5:
+                d1, d2 = d2, d1
+            self.check(d1, d2)
+
+
+if __name__ == "__main__":
+    unittest.main()
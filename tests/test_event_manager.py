@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import JsonBackend
+
+# Adds events through the public functions and exits without closing the store
+WRITER = f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+import event_manager
+for i in range(200):
+    event_manager.add_event("2026-01-01", f"event {{i}}")
+"""
+
+
+class ExitTest(unittest.TestCase):
+    def test_writes_queued_at_exit_are_saved(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            subprocess.run([sys.executable, "-c", WRITER], cwd=tmp, check=True)
+            backend = JsonBackend(os.path.join(tmp, "calendar_events.json"),
+                                  journal=True, lazy=True)
+            texts = [event.text for event in backend.load().get("2026-01-01", [])]
+            self.assertEqual(texts, [f"event {i}" for i in range(200)])
+
+
+if __name__ == "__main__":
+    unittest.main()
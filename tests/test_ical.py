@@ -0,0 +1,62 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ical import iter_export, iter_import, read_events
+from recurrence import RecurringEvents
+from storage import RuleFile
+
+LO, HI = date(2026, 1, 1).toordinal(), date(2029, 12, 31).toordinal()
+
+
+def occurrences(recurring):
+    return sorted((day, rule.text) for day, rule in recurring.iter_days(LO, HI))
+
+
+class RecurringRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = RecurringEvents(RuleFile(os.path.join(tmp.name, "source.json")))
+        self.target = RecurringEvents(RuleFile(os.path.join(tmp.name, "target.json")))
+
+    def round_trip(self):
+        f = io.StringIO()
+        list(iter_export([], f, 100, self.source.rules()))
+        f.seek(0)
+        return list(iter_import(f, self.fail, 2,
+                                lambda rules: len(self.target.add_many(rules))))[-1]
+
+    def test_rules_keep_their_occurrences(self):
+        # Starts on a Wednesday, repeating on Mondays and Fridays
+        weekly = self.source.add("2026-01-07", "Gym", "weekly", 2, [0, 4], until="2026-12-31")
+        self.source.skip(weekly, "2026-02-02")
+        self.source.add("2026-01-31", "Rent, bills; etc", "monthly", count=10)
+        self.source.add("2026-02-28", "Birthday", "yearly", until="2029-03-01")
+        daily = self.source.add("2026-03-01", "Standup", "daily", byweekday=[0, 1, 2, 3, 4],
+                                count=30)
+        self.source.skip(daily, "2026-03-03")
+        self.source.skip(daily, "2026-03-05")
+        self.assertEqual(self.round_trip(), 4)
+        self.assertEqual(occurrences(self.target), occurrences(self.source))
+
+    def test_count_and_until_together(self):
+        self.source.add("2026-01-05", "Class", "weekly", count=20, until="2026-03-01")
+        self.assertEqual(self.round_trip(), 1)
+        self.assertEqual(occurrences(self.target), occurrences(self.source))
+
+    def test_unsupported_rule_keeps_first_date(self):
+        text = ("BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nDTSTART;VALUE=DATE:20260105\r\n"
+                "RRULE:FREQ=MONTHLY;BYDAY=1MO\r\nSUMMARY:Meeting\r\nEND:VEVENT\r\n"
+                "END:VCALENDAR\r\n")
+        events = list(read_events(io.StringIO(text)))
+        self.assertEqual(events, [("2026-01-05", "Meeting", None, None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_store import EventStore
+from storage import JsonBackend, ShardedBackend, SqliteBackend
+
+PROCESSES = 4
+EVENTS_PER_PROCESS = 50
+
+
+def open_backend(kind, tmp):
+    if kind == "json":
+        return JsonBackend(os.path.join(tmp, "events.json"), journal=True, lazy=True)
+    if kind == "shards":
+        return ShardedBackend(os.path.join(tmp, "shards"))
+    return SqliteBackend(os.path.join(tmp, "events.db"))
+
+
+def write_events(kind, tmp, worker):
+    """Add events, editing every fifth one right after adding it"""
+    store = EventStore(open_backend(kind, tmp), background=True)
+    for i in range(EVENTS_PER_PROCESS):
+        date_str = f"2026-{i % 12 + 1:02d}-{worker + 1:02d}"
+        if i % 5 == 0:
+            event_id = store.add(date_str, f"p{worker}-{i} draft")
+            store.update_by_id(event_id, text=f"p{worker}-{i}")
+        else:
+            store.add(date_str, f"p{worker}-{i}")
+    store.close()
+
+
+class ConcurrentWritersTest(unittest.TestCase):
+    def check(self, kind):
+        with tempfile.TemporaryDirectory() as tmp:
+            open_backend(kind, tmp).save({})
+            processes = [multiprocessing.Process(target=write_events, args=(kind, tmp, worker))
+                         for worker in range(PROCESSES)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+                self.assertEqual(process.exitcode, 0)
+            events = [event for event_list in open_backend(kind, tmp).load().values()
+                      for event in event_list]
+            self.assertEqual(sorted(event.text for event in events),
+                             sorted(f"p{worker}-{i}" for worker in range(PROCESSES)
+                                    for i in range(EVENTS_PER_PROCESS)))
+            self.assertEqual(len({event.id for event in events}), len(events))
+
+    def test_json(self):
+        self.check("json")
+
+    def test_shards(self):
+        self.check("shards")
+
+    def test_sqlite(self):
+        self.check("sqlite")
+
+
+if __name__ == "__main__":
+    unittest.main()
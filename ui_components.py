@@ -40,6 +40,7 @@ def create_sidebar(parent, show_frame, *_):
         ("Add Days", "add"),
         ("Subtract Days", "subtract"),
         ("Duration", "count"),
+        ("Business Days", "business"),
     ]
     for text, frame in tools:
         if frame == "events":